@@ -79,22 +79,24 @@ class DriveHelper(object):
     """
     self.service.files().delete(fileId=file_id).execute()
 
-  def CreateFile(self, file_name, content, parent_folder=None):
+  def CreateFile(self, file_name, content, parent_folder=None,
+                 mimetype='text/csv'):
     """ Creates a file with the given name and content
 
     Args:
       file_name: The name of the file to create.
       content: The content of the new file.
       parent_folder (optional): The folder to copy the file into. Defaults to root folder. 
+      mimetype (optional): The MIME type of the content. Defaults to text/csv.
 
     Returns:
       The file id.
     """
     fh = BytesIO(str(content))
-    media = http.MediaIoBaseUpload(fh, mimetype='text/csv', resumable=True)
+    media = http.MediaIoBaseUpload(fh, mimetype=mimetype, resumable=True)
     file_metadata = {
       'title': file_name,
-      'mimeType': 'text/csv',
+      'mimeType': mimetype,
       'parents': [{'id': parent_folder}]
     }
     file = self.service.files().insert(body=file_metadata, media_body=media).execute()
@@ -35,6 +35,7 @@ from feature import Feature
 from featurecollection import FeatureCollection
 from filter import Filter
 from function import Function
+import futures
 from geometry import Geometry
 from image import Image
 from imagecollection import ImageCollection
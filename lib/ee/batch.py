@@ -10,7 +10,10 @@ on them to launch them, then poll status() to find out when they are finished.
 # Using camelCase public function naming to match the rest of the library.
 # pylint: disable=g-bad-name
 
+import collections
 import json
+import time
+
 import data
 import ee_exception
 import geometry
@@ -116,6 +119,153 @@ class Task(object):
       return '<Task "%s">' % self.id
 
 
+class TaskMonitor(object):
+  """Tracks the states of many tasks, polling them together.
+
+  Each call to poll() fetches the status of every due task with a single
+  /taskstatus request, so watching N tasks costs one request per tick rather
+  than N. A task falls due again after an interval that grows with the time it
+  has been watched, from min_interval up to max_interval, since long tasks
+  rarely finish soon after they were last polled. Tasks with a cancellation
+  requested are polled at min_interval.
+
+  Callbacks are called with (task_id, old_state, new_state, status) whenever a
+  poll finds a task in a different state, including the first time it is
+  polled, when old_state is None. Finished tasks are no longer polled.
+  """
+
+  # The states of unfinished tasks.
+  ACTIVE_STATES = (Task.State.READY,
+                   Task.State.RUNNING,
+                   Task.State.CANCEL_REQUESTED)
+
+  # The fraction of a task's age that it waits between polls.
+  AGE_FACTOR = 0.2
+
+  def __init__(self, min_interval=5, max_interval=60, clock=time.time):
+    """Creates an empty monitor.
+
+    Args:
+      min_interval: The shortest time between polls of a task, in seconds.
+      max_interval: The longest time between polls of a task, in seconds.
+      clock: A function returning the current time in seconds.
+    """
+    self.min_interval = min_interval
+    self.max_interval = max_interval
+    self._clock = clock
+    self._watches = collections.OrderedDict()
+    self._callbacks = []
+
+  def add(self, task, callback=None, since=None):
+    """Starts watching a task.
+
+    Args:
+      task: A Task or a task ID.
+      callback: An optional function called on this task's transitions only.
+      since: The time the task was started, in seconds. Defaults to now. The
+          polling interval of the task grows with the time since then.
+    """
+    task_id = task.id if isinstance(task, Task) else task
+    self._watches[task_id] = {
+        'since': self._clock() if since is None else since,
+        'due': self._clock(),
+        'state': None,
+        'status': None,
+        'callbacks': [callback] if callback else [],
+    }
+
+  def remove(self, task):
+    """Stops watching a task, given as a Task or a task ID."""
+    self._watches.pop(task.id if isinstance(task, Task) else task, None)
+
+  def on_transition(self, callback):
+    """Calls callback on the transitions of every watched task."""
+    self._callbacks.append(callback)
+
+  def status(self, task_id):
+    """Returns the last status polled for the task, or None."""
+    return self._watches[task_id]['status']
+
+  def state(self, task_id):
+    """Returns the last state polled for the task, or None."""
+    return self._watches[task_id]['state']
+
+  def active(self):
+    """Returns the IDs of the watched tasks not known to have finished."""
+    return [task_id for task_id, watch in self._watches.items()
+            if watch['state'] is None or watch['state'] in self.ACTIVE_STATES]
+
+  def interval(self, task_id):
+    """Returns the number of seconds to wait before polling the task again."""
+    watch = self._watches[task_id]
+    if watch['state'] == Task.State.CANCEL_REQUESTED:
+      return self.min_interval
+    age = self._clock() - watch['since']
+    return min(max(age * self.AGE_FACTOR, self.min_interval),
+               self.max_interval)
+
+  def next_poll(self):
+    """Returns the seconds until a task is due, or None if all have finished."""
+    due = [self._watches[task_id]['due'] for task_id in self.active()]
+    if not due:
+      return None
+    return max(min(due) - self._clock(), 0)
+
+  def poll(self, force=False):
+    """Fetches the status of the due tasks in one request.
+
+    Args:
+      force: Whether to poll all the unfinished tasks, due or not.
+
+    Returns:
+      The IDs of the tasks that changed state.
+    """
+    now = self._clock()
+    task_ids = [task_id for task_id in self.active()
+                if force or self._watches[task_id]['due'] <= now]
+    if not task_ids:
+      return []
+    changed = []
+    for status in data.getTaskStatus(task_ids):
+      watch = self._watches.get(status['id'])
+      if watch is None:
+        continue
+      if status['state'] == 'UNKNOWN':
+        status['state'] = Task.State.UNSUBMITTED
+      old_state, watch['state'], watch['status'] = (
+          watch['state'], status['state'], status)
+      watch['due'] = now + self.interval(status['id'])
+      if old_state != status['state']:
+        changed.append(status['id'])
+        for callback in watch['callbacks'] + self._callbacks:
+          callback(status['id'], old_state, status['state'], status)
+    return changed
+
+  def wait(self, timeout=None, sleep=time.sleep):
+    """Polls the tasks until they have all finished.
+
+    Args:
+      timeout: The maximum number of seconds to wait, or None to wait until
+          they have finished.
+      sleep: A function that waits for the given number of seconds.
+
+    Returns:
+      Whether all the tasks finished.
+    """
+    end = None if timeout is None else self._clock() + timeout
+    while True:
+      self.poll()
+      wait = self.next_poll()
+      if wait is None:
+        return True
+      if end is not None:
+        remaining = end - self._clock()
+        if remaining <= 0:
+          return False
+        wait = min(wait, remaining)
+      sleep(wait)
+
+
 class Export(object):
   """A static class with methods to start export tasks."""
 
@@ -11,7 +11,6 @@ from datetime import datetime
 import json
 import os
 import re
-import threading
 import time
 
 import urllib
@@ -104,54 +103,56 @@ def truncate(string, length):
 
 def wait_for_task(task_id, timeout, log_progress=True):
   """Waits for the specified task to finish, or a timeout to occur."""
+  wait_for_tasks([task_id], timeout, log_progress)
+
+
+def wait_for_tasks(task_id_list, timeout, log_progress=False):
+  """For each task specified in task_id_list, wait for that task or timeout.
+
+  All the tasks are polled together, with one status request per poll.
+  """
   start = time.time()
-  elapsed = 0
-  last_check = 0
-  while True:
-    elapsed = time.time() - start
-    status = ee.data.getTaskStatus(task_id)[0]
-    state = status['state']
+  monitor = ee.batch.TaskMonitor(max_interval=10)
+
+  def log_finished(task_id, unused_old_state, state, status):
     if state in TASK_FINISHED_STATES:
-      error_message = status.get('error_message', None)
       print('Task %s ended at state: %s after %.2f seconds'
-            % (task_id, state, elapsed))
+            % (task_id, state, time.time() - start))
+      error_message = status.get('error_message', None)
       if error_message:
         print('Error: %s' % error_message)
-      return
+
+  monitor.on_transition(log_finished)
+  for task_id in task_id_list:
+    monitor.add(task_id, since=start)
+
+  elapsed = 0
+  last_check = 0
+  while True:
+    elapsed = time.time() - start
+    monitor.poll()
+    if not monitor.active():
+      break
     if log_progress and elapsed - last_check >= 30:
-      print('[{:%H:%M:%S}] Current state for task {}: {}'
-            .format(datetime.now(), task_id, state))
+      for task_id in monitor.active():
+        print('[{:%H:%M:%S}] Current state for task {}: {}'
+              .format(datetime.now(), task_id, monitor.state(task_id)))
       last_check = elapsed
     remaining = timeout - elapsed
     if remaining > 0:
-      time.sleep(min(10, remaining))
+      time.sleep(min(monitor.next_poll(), remaining))
     else:
+      for task_id in monitor.active():
+        print('Wait for task %s timed out after %.2f seconds'
+              % (task_id, elapsed))
       break
-  print('Wait for task %s timed out after %.2f seconds' % (task_id, elapsed))
-
-
-def wait_for_tasks(task_id_list, timeout, log_progress=False):
-  """For each task specified in task_id_list, wait for that task or timeout."""
 
   if len(task_id_list) == 1:
-    wait_for_task(task_id_list[0], timeout, log_progress)
     return
-
-  threads = []
-  for task_id in task_id_list:
-    t = threading.Thread(target=wait_for_task,
-                         args=(task_id, timeout, log_progress))
-    threads.append(t)
-    t.start()
-
-  for thread in threads:
-    thread.join()
-
-  status_list = ee.data.getTaskStatus(task_id_list)
   status_counts = collections.defaultdict(int)
-  for status in status_list:
-    status_counts[status['state']] += 1
-  num_incomplete = (len(status_list) - status_counts['COMPLETED']
+  for task_id in task_id_list:
+    status_counts[monitor.state(task_id)] += 1
+  num_incomplete = (len(task_id_list) - status_counts['COMPLETED']
                     - status_counts['FAILED'] - status_counts['CANCELLED'])
   print('Finished waiting for tasks.\n  Status summary:')
   print('  %d tasks completed successfully.' % status_counts['COMPLETED'])
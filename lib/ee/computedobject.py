@@ -88,6 +88,18 @@ class ComputedObject(encodable.Encodable):
     """
     return data.getValue({'json': self.serialize()})
 
+  def getInfoAsync(self, opt_deadline_ms=None):
+    """Fetch information about this object without waiting for it.
+
+    Args:
+      opt_deadline_ms: Optional number of milliseconds after which the call
+          is abandoned.
+
+    Returns:
+      A futures.Future for the value getInfo() would return.
+    """
+    return data.getValueAsync({'json': self.serialize()}, opt_deadline_ms)
+
   def encode(self, encoder):
     """Encodes the object in a format compatible with Serializer."""
     if self.isVariable():
@@ -6,11 +6,17 @@
 # Using lowercase function naming to match the JavaScript names.
 # pylint: disable=g-bad-name
 
+import copy
 import json
+import sys
+import threading
+import time
 import urllib
 
 import ee_exception
+import futures
 import httplib2
+import serializer
 
 
 # OAuth2 credentials object.  This may be set by ee.Initialize().
@@ -29,6 +35,26 @@ _initialized = False
 # it timed out. 0 means no limit.
 _deadline_ms = 100000
 
+# The maximum number of connections to the API that may be open at once, and
+# how many seconds an idle pooled connection is kept before it is closed.
+_max_connections = 10
+_connection_idle_s = 60
+
+# Idle pooled connections as [credentials, timeout, http, last_used] lists.
+_idle_connections = []
+_connection_lock = threading.Lock()
+_connection_slots = threading.BoundedSemaphore(_max_connections)
+
+# Read-only endpoints for which identical concurrent calls share one request.
+_SINGLE_FLIGHT_PATHS = ('/value', '/mapid', '/info', '/list', '/algorithms',
+                        '/thumb')
+
+# Calls in progress on those endpoints, by _singleFlightKey(), and counts of
+# the calls sent upstream and the calls that waited on one of them instead.
+_flights = {}
+_flight_lock = threading.Lock()
+_flight_stats = {'upstream': 0, 'coalesced': 0}
+
 # The default base URL for API calls.
 DEFAULT_API_BASE_URL = 'https://earthengine.googleapis.com/api'
 
@@ -74,6 +100,16 @@ def reset():
   _api_base_url = None
   _tile_base_url = None
   _initialized = False
+  resetConnections()
+
+
+def resetConnections():
+  """Closes all idle pooled connections."""
+  with _connection_lock:
+    idle = _idle_connections[:]
+    del _idle_connections[:]
+  for connection in idle:
+    _closeConnection(connection)
 
 
 def setDeadline(milliseconds):
@@ -184,6 +220,41 @@ def getValue(params):
   return send_('/value', params)
 
 
+def getValueAsync(params, opt_deadline_ms=None):
+  """Retrieve a processed value without waiting for it.
+
+  Args:
+    params: A dictionary containing:
+        json - (String) A JSON object to be evaluated.
+    opt_deadline_ms: Optional number of milliseconds after which the call is
+        abandoned.
+
+  Returns:
+    A futures.Future for the value call results.
+  """
+  return futures.submit(getValue, params, deadline_ms=opt_deadline_ms)
+
+
+def getValues(objects):
+  """Evaluate several objects with a single request.
+
+  The objects are packed into one list or dictionary, so subgraphs shared
+  between them are serialized, and computed by the server, only once.
+
+  Args:
+    objects: A list or dictionary of ComputedObjects, or anything else the
+        serializer can encode.
+
+  Returns:
+    The computed values, in a list or dictionary with the same keys or order
+    as objects.
+  """
+  result = getValue({'json': serializer.toJSON(objects)})
+  if isinstance(objects, tuple):
+    result = tuple(result)
+  return result
+
+
 def getThumbnail(params):
   """Get a Thumbnail for a given asset.
 
@@ -550,14 +621,69 @@ def send_(path, params, opt_method='POST', opt_raw=False):
   # Make sure we never perform API calls before initialization.
   initialize()
 
+  if path not in _SINGLE_FLIGHT_PATHS:
+    return _send(path, params, opt_method, opt_raw)
+
+  key = _singleFlightKey(path, params, opt_method, opt_raw)
+  with _flight_lock:
+    flight = _flights.get(key)
+    leader = flight is None
+    if leader:
+      flight = _flights[key] = _Flight()
+      _flight_stats['upstream'] += 1
+    else:
+      _flight_stats['coalesced'] += 1
+
+  if leader:
+    try:
+      flight.result = _send(path, params, opt_method, opt_raw)
+    except:
+      flight.exc_info = sys.exc_info()
+    finally:
+      with _flight_lock:
+        del _flights[key]
+      flight.done.set()
+  else:
+    flight.done.wait()
+
+  if flight.exc_info:
+    raise flight.exc_info[0], flight.exc_info[1], flight.exc_info[2]
+  # Waiters get their own copy, so callers can't see each other's changes.
+  return flight.result if leader else copy.deepcopy(flight.result)
+
+
+def getSingleFlightStats():
+  """Returns counts of the calls that shared an identical in-flight request.
+
+  Returns:
+    A dictionary with the number of calls sent to the server ('upstream') and
+    the number of calls that waited for one of those instead ('coalesced').
+  """
+  with _flight_lock:
+    return dict(_flight_stats)
+
+
+class _Flight(object):
+  """An API call in progress, shared by all identical concurrent calls."""
+
+  def __init__(self):
+    self.done = threading.Event()
+    self.result = None
+    self.exc_info = None
+
+
+def _singleFlightKey(path, params, opt_method, opt_raw):
+  """Returns a key identifying calls that are guaranteed the same response."""
+  return (_api_base_url, id(_credentials), path, opt_method, opt_raw,
+          json.dumps(params, sort_keys=True))
+
+
+def _send(path, params, opt_method='POST', opt_raw=False):
+  """Send an API call without sharing it. See send_()."""
   url = _api_base_url + path
   payload = urllib.urlencode(params)
-  http = httplib2.Http(timeout=int(_deadline_ms / 1000) or None)
 
   headers = {}
-  if _credentials:
-    http = _credentials.authorize(http)
-
   if opt_method == 'GET':
     url = url + ('&' if '?' in url else '?') + payload
     payload = None
@@ -566,12 +692,19 @@ def send_(path, params, opt_method='POST', opt_raw=False):
   else:
     raise ee_exception.EEException('Unexpected request method: ' + opt_method)
 
-  try:
-    response, content = http.request(url, method=opt_method, body=payload,
-                                     headers=headers)
-  except httplib2.HttpLib2Error, e:
-    raise ee_exception.EEException(
-        'Unexpected HTTP error: %s' % e.message)
+  with _connection_slots:
+    connection = _acquireConnection()
+    try:
+      response, content = connection[2].request(
+          url, method=opt_method, body=payload, headers=headers)
+    except httplib2.HttpLib2Error, e:
+      _closeConnection(connection)
+      raise ee_exception.EEException(
+          'Unexpected HTTP error: %s' % e.message)
+    except:
+      _closeConnection(connection)
+      raise
+    _releaseConnection(connection)
 
   # Whether or not the response is an error, it may be JSON.
   content_type = (response['content-type'] or 'application/json').split(';')[0]
@@ -601,3 +734,51 @@ def send_(path, params, opt_method='POST', opt_raw=False):
         'Response was unexpectedly not JSON, but %s' % response['content-type'])
   else:
     return json_content['data']
+
+
+def _acquireConnection():
+  """Takes a pooled connection for the current settings, or opens a new one.
+
+  Pooled httplib2.Http objects keep their sockets alive between calls, so
+  reusing them saves a TCP and TLS handshake per request. Each one is only
+  used by one thread at a time.
+
+  Returns:
+    A [credentials, timeout, http, last_used] list.
+  """
+  timeout = int(_deadline_ms / 1000) or None
+  now = time.time()
+  with _connection_lock:
+    stale = [c for c in _idle_connections
+             if now - c[3] >= _connection_idle_s]
+    for connection in stale:
+      _idle_connections.remove(connection)
+    for connection in reversed(_idle_connections):
+      if connection[0] is _credentials and connection[1] == timeout:
+        _idle_connections.remove(connection)
+        break
+    else:
+      connection = None
+  for old in stale:
+    _closeConnection(old)
+  if connection is None:
+    http = httplib2.Http(timeout=timeout)
+    if _credentials:
+      http = _credentials.authorize(http)
+    connection = [_credentials, timeout, http, now]
+  return connection
+
+
+def _releaseConnection(connection):
+  """Returns a connection to the pool of idle connections."""
+  connection[3] = time.time()
+  with _connection_lock:
+    _idle_connections.append(connection)
+
+
+def _closeConnection(connection):
+  """Closes the sockets held by a connection."""
+  http = connection[2]
+  for conn in http.connections.values():
+    conn.close()
+  http.connections.clear()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+"""Futures for running Earth Engine calls concurrently.
+
+Calls are run by a bounded pool of worker threads. Workers are started when
+work is submitted and exit as soon as the queue is empty, so no thread outlives
+the calls it was started for.
+"""
+
+
+
+# Using lowercase function naming to match the JavaScript names.
+# pylint: disable=g-bad-name
+
+import collections
+import threading
+import time
+
+import ee_exception
+
+
+# The maximum number of calls that run at the same time.
+_MAX_WORKERS = 8
+
+
+class CancelledError(ee_exception.EEException):
+  """Raised when the result of a cancelled call is requested."""
+
+
+class DeadlineExceededError(ee_exception.EEException):
+  """Raised when a call did not finish before its deadline."""
+
+
+class Future(object):
+  """The pending result of a call submitted to an Executor."""
+
+  def __init__(self, fn, args, kwargs, deadline_ms=None):
+    """Creates a future. Use Executor.submit() or submit() instead.
+
+    Args:
+      fn: The function to call.
+      args: The positional arguments for fn.
+      kwargs: The keyword arguments for fn.
+      deadline_ms: Optional number of milliseconds from now after which the
+          call is abandoned.
+    """
+    self._fn = fn
+    self._args = args
+    self._kwargs = kwargs
+    self._deadline = (time.time() + deadline_ms / 1e3) if deadline_ms else None
+    self._condition = threading.Condition()
+    self._running = False
+    self._done = False
+    self._result = None
+    self._exception = None
+    self._callbacks = []
+
+  def cancel(self):
+    """Cancels the call.
+
+    A call that has not started yet will never run. The result of a running
+    call is discarded when it finishes.
+
+    Returns:
+      False if the call had already finished, otherwise True.
+    """
+    return self._finish(exception=CancelledError('Call was cancelled.'))
+
+  def cancelled(self):
+    """Returns whether the call was cancelled."""
+    with self._condition:
+      return isinstance(self._exception, CancelledError)
+
+  def running(self):
+    """Returns whether the call is currently running."""
+    with self._condition:
+      return self._running and not self._done
+
+  def done(self):
+    """Returns whether the call has finished, failed or was cancelled."""
+    with self._condition:
+      return self._done
+
+  def result(self, timeout=None):
+    """Waits for the call to finish and returns its result.
+
+    Args:
+      timeout: The maximum number of seconds to wait. None waits until the
+          call finishes or its deadline passes.
+
+    Returns:
+      The return value of the call.
+
+    Raises:
+      CancelledError: If the call was cancelled.
+      DeadlineExceededError: If the deadline passed before the call finished.
+      EEException: If the timeout passed before the call finished.
+      Exception: Whatever the call raised.
+    """
+    exception = self.exception(timeout)
+    if exception is not None:
+      raise exception
+    return self._result
+
+  def exception(self, timeout=None):
+    """Waits for the call to finish and returns what it raised, if anything.
+
+    Args:
+      timeout: The maximum number of seconds to wait. None waits until the
+          call finishes or its deadline passes.
+
+    Returns:
+      The exception raised by the call, or None if it succeeded.
+
+    Raises:
+      EEException: If the timeout passed before the call finished.
+    """
+    end = None if timeout is None else time.time() + timeout
+    with self._condition:
+      while not self._done:
+        now = time.time()
+        if self._deadline is not None and now >= self._deadline:
+          break
+        if end is not None and now >= end:
+          raise ee_exception.EEException(
+              'Timed out waiting for the call to finish.')
+        wait = min(t for t in (end, self._deadline, now + 1) if t) - now
+        self._condition.wait(max(wait, 0))
+    self._expire()
+    return self._exception
+
+  def add_done_callback(self, fn):
+    """Calls fn with this future once it is done."""
+    with self._condition:
+      if not self._done:
+        self._callbacks.append(fn)
+        return
+    fn(self)
+
+  def _run(self):
+    """Runs the call on the current thread, unless it was abandoned."""
+    with self._condition:
+      if self._done:
+        return
+      self._running = True
+    if self._expire():
+      return
+    try:
+      result = self._fn(*self._args, **self._kwargs)
+    except Exception as e:  # pylint: disable=broad-except
+      self._finish(exception=e)
+    else:
+      self._finish(result=result)
+
+  def _expire(self):
+    """Fails the call if its deadline has passed. Returns whether it did."""
+    if self._deadline is not None and time.time() >= self._deadline:
+      return self._finish(exception=DeadlineExceededError(
+          'Call did not finish before its deadline.'))
+    return False
+
+  def _finish(self, result=None, exception=None):
+    """Records the outcome of the call, unless it already has one."""
+    with self._condition:
+      if self._done:
+        return False
+      self._done = True
+      self._result = result
+      self._exception = exception
+      callbacks, self._callbacks = self._callbacks, []
+      self._condition.notify_all()
+    for fn in callbacks:
+      fn(self)
+    return True
+
+
+class Executor(object):
+  """Runs calls on a bounded number of worker threads."""
+
+  def __init__(self, max_workers=_MAX_WORKERS):
+    """Creates an executor.
+
+    Args:
+      max_workers: The maximum number of calls that run at the same time.
+    """
+    self._max_workers = max_workers
+    self._workers = 0
+    self._queue = collections.deque()
+    self._lock = threading.Lock()
+
+  def submit(self, fn, *args, **kwargs):
+    """Schedules fn(*args, **kwargs) to be run.
+
+    Args:
+      fn: The function to call.
+      *args: Positional arguments for fn.
+      **kwargs: Keyword arguments for fn. A 'deadline_ms' keyword is not
+          passed on, it sets the number of milliseconds after which the call
+          is abandoned.
+
+    Returns:
+      A Future for the result of the call.
+    """
+    deadline_ms = kwargs.pop('deadline_ms', None)
+    future = Future(fn, args, kwargs, deadline_ms)
+    with self._lock:
+      self._queue.append(future)
+      start_worker = self._workers < self._max_workers
+      if start_worker:
+        self._workers += 1
+    if start_worker:
+      worker = threading.Thread(target=self._work)
+      worker.daemon = True
+      worker.start()
+    return future
+
+  def _work(self):
+    """Runs queued calls until there are none left."""
+    while True:
+      with self._lock:
+        if not self._queue:
+          self._workers -= 1
+          return
+        future = self._queue.popleft()
+      future._run()  # pylint: disable=protected-access
+
+
+# The executor used by submit() and the *Async functions.
+_executor = Executor()
+
+
+def submit(fn, *args, **kwargs):
+  """Schedules fn(*args, **kwargs) on the shared executor.
+
+  See Executor.submit().
+  """
+  return _executor.submit(fn, *args, **kwargs)
+
+
+def wait(futures, timeout=None):
+  """Waits for futures to finish.
+
+  Args:
+    futures: The futures to wait for.
+    timeout: The maximum number of seconds to wait, or None to wait until all
+        of them are done.
+
+  Returns:
+    A pair of lists, the futures that are done and those that are not.
+  """
+  end = None if timeout is None else time.time() + timeout
+  for future in futures:
+    remaining = None if end is None else max(end - time.time(), 0)
+    try:
+      future.exception(remaining)
+    except ee_exception.EEException:
+      break
+  done = [f for f in futures if f.done()]
+  return done, [f for f in futures if not f.done()]
+
+
+def gather(futures, timeout=None):
+  """Waits for futures and returns their results.
+
+  If any of them fails, the others are cancelled and its exception is raised.
+
+  Args:
+    futures: The futures to gather.
+    timeout: The maximum number of seconds to wait for all of them.
+
+  Returns:
+    A list of the results, in the same order as futures.
+  """
+  end = None if timeout is None else time.time() + timeout
+  results = []
+  try:
+    for future in futures:
+      remaining = None if end is None else max(end - time.time(), 0)
+      results.append(future.result(remaining))
+  except:
+    for future in futures:
+      future.cancel()
+    raise
+  return results
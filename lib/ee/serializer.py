@@ -7,9 +7,9 @@
 # pylint: disable=g-bad-name
 
 import datetime
+import hashlib
 import json
 import math
-import md5
 import numbers
 
 import ee_exception
@@ -19,6 +19,9 @@ import encodable
 # The datetime for the beginning of the Unix epoch.
 _EPOCH_DATETIME = datetime.datetime.utcfromtimestamp(0)
 
+# Pre-encoded subgraphs by the id() of the object they encode. See memoize().
+_memoized = {}
+
 
 def DatetimeToMicroseconds(date):
   """Convert a datetime to a timestamp, microseconds since the epoch."""
@@ -49,6 +52,11 @@ class Serializer(object):
     # A lookup table from object ID as retrieved by id() to md5 hash values.
     self._hashcache = {}
 
+    # The ValueRefs handed out so far. While encoding they refer to subtrees
+    # by hash, so the JSON of a subtree already contains the hashes of its
+    # children; _encode() renames them to the names in self._scope at the end.
+    self._refs = []
+
   def _encode(self, obj):
     """Encodes a top level object in the EE API v2 (DAG) format.
 
@@ -60,6 +68,8 @@ class Serializer(object):
     """
     value = self._encodeValue(obj)
     if self._is_compound:
+      for ref in self._refs:
+        ref['value'] = self._encoded[ref['value']]
       if (isinstance(value, dict) and
           value['type'] == 'ValueRef' and
           len(self._scope) == 1):
@@ -76,6 +86,7 @@ class Serializer(object):
       self._scope = []
       self._encoded = {}
       self._hashcache = {}
+      self._refs = []
     return value
 
   def _encodeValue(self, obj):
@@ -92,12 +103,13 @@ class Serializer(object):
     obj_id = id(obj)
     hashval = self._hashcache.get(obj_id)
     encoded = self._encoded.get(hashval, None)
+    memo = _memoized.get(obj_id)
     if self._is_compound and encoded:
       # Already encoded objects are encoded as ValueRefs and returned directly.
-      return {
-          'type': 'ValueRef',
-          'value': encoded
-      }
+      return self._valueRef(hashval)
+    elif self._is_compound and memo and memo.obj is obj:
+      # Memoized objects are spliced into the scope without walking them.
+      return self._splice(memo)
     elif obj is None or isinstance(obj, (bool, numbers.Number, basestring)):
       # Primitives are encoded as is and not saved in the scope.
       return obj
@@ -131,21 +143,91 @@ class Serializer(object):
       raise ee_exception.EEException('Can\'t encode object: %s' % obj)
 
     if self._is_compound:
-      # Save the new object and return a ValueRef.
-      hashval = md5.new(json.dumps(result)).digest()
+      # Save the new object and return a ValueRef. The children of result are
+      # ValueRefs holding their own hashes, so hashing its JSON composes their
+      # hashes without walking the subtree again.
+      hashval = hashlib.md5(json.dumps(result)).hexdigest()
       self._hashcache[obj_id] = hashval
       name = self._encoded.get(hashval, None)
       if not name:
         name = str(len(self._scope))
         self._scope.append((name, result))
         self._encoded[hashval] = name
-      return {
-          'type': 'ValueRef',
-          'value': name
-      }
+      return self._valueRef(hashval)
     else:
       return result
 
+  def _splice(self, memo):
+    """Adds a pre-encoded subgraph to the scope.
+
+    Args:
+      memo: The _Memo of the subgraph.
+
+    Returns:
+      The encoded root of the subgraph.
+    """
+    for hashval, result in memo.scope:
+      if hashval not in self._encoded:
+        name = str(len(self._scope))
+        self._scope.append((name, self._copy(result)))
+        self._encoded[hashval] = name
+    if memo.hashval:
+      self._hashcache[id(memo.obj)] = memo.hashval
+    return self._copy(memo.value)
+
+  def _copy(self, value):
+    """Copies a pre-encoded value, registering the ValueRefs in the copy."""
+    if isinstance(value, dict):
+      if value.get('type') == 'ValueRef':
+        return self._valueRef(value['value'])
+      return dict((key, self._copy(item)) for key, item in value.iteritems())
+    elif isinstance(value, list):
+      return [self._copy(item) for item in value]
+    else:
+      return value
+
+  def _valueRef(self, hashval):
+    """Returns a ValueRef to the subtree with the given hash."""
+    ref = {
+        'type': 'ValueRef',
+        'value': hashval
+    }
+    self._refs.append(ref)
+    return ref
+
+
+class _Memo(object):
+  """A subgraph encoded ahead of time by memoize()."""
+
+  def __init__(self, obj):
+    serializer = Serializer(True)
+    # pylint: disable=protected-access
+    self.obj = obj
+    self.value = serializer._encodeValue(obj)
+    self.hashval = serializer._hashcache.get(id(obj))
+    names = dict((name, hashval)
+                 for hashval, name in serializer._encoded.iteritems())
+    # Scope entries in dependency order, with ValueRefs still holding hashes.
+    self.scope = [(names[name], result) for name, result in serializer._scope]
+
+
+def memoize(obj):
+  """Encodes an object once so that serializing it again is cheap.
+
+  Later serializations that include obj splice the stored encoding into their
+  scope instead of walking obj again. The output is the same as without
+  memoizing. Only use this for objects that are reused for the life of the
+  process, as obj is kept alive and must not be modified afterwards.
+
+  Args:
+    obj: The object to memoize.
+
+  Returns:
+    obj, for chaining.
+  """
+  _memoized[id(obj)] = _Memo(obj)
+  return obj
+
 
 def encode(obj, is_compound=True):
   """Serialize an object to a JSON-compatible structure for API calls.
@@ -39,6 +39,8 @@ class BatchTestCase(apitestcase.ApiTestCase):
 
     self.start_call_params = None
     self.update_call_params = None
+    self.status_calls = []
+    self.task_states = {}
 
     def MockSend(path, params, unused_method=None, unused_raw=None):
       if path == '/newtaskid':
@@ -46,16 +48,22 @@ class BatchTestCase(apitestcase.ApiTestCase):
       elif path == '/tasklist':
         return {'tasks': [TASK_STATUS_1.copy(), TASK_STATUS_2.copy()]}
       elif path == '/taskstatus':
-        if params['q'] == TASK_STATUS_1['id']:
-          return [TASK_STATUS_1.copy()]
-        elif params['q'] == TASK_STATUS_2['id']:
-          return [TASK_STATUS_2.copy()]
-        else:
-          return [{
-              'creation_timestamp_ms': 0,
-              'id': params['q'],
-              'state': 'UNKNOWN'
-          }]
+        self.status_calls.append(params['q'])
+        statuses = []
+        for task_id in params['q'].split(','):
+          if task_id == TASK_STATUS_1['id']:
+            statuses.append(TASK_STATUS_1.copy())
+          elif task_id == TASK_STATUS_2['id']:
+            statuses.append(TASK_STATUS_2.copy())
+          elif task_id in self.task_states:
+            statuses.append({'id': task_id, 'state': self.task_states[task_id]})
+          else:
+            statuses.append({
+                'creation_timestamp_ms': 0,
+                'id': task_id,
+                'state': 'UNKNOWN'
+            })
+        return statuses
       elif path == '/processingrequest':
         self.start_call_params = params
         return {'started': 'OK'}
@@ -123,6 +131,85 @@ class BatchTestCase(apitestcase.ApiTestCase):
     self.assertEquals('TEST1', self.update_call_params['id'])
     self.assertEquals('CANCEL', self.update_call_params['action'])
 
+  def testTaskMonitorPollsTogether(self):
+    """Verifies that TaskMonitor polls all its tasks in one request."""
+    monitor = ee.batch.TaskMonitor()
+    monitor.add('TEST1')
+    monitor.add(ee.batch.Task('TEST2'))
+    monitor.add('TEST3')
+    self.assertEquals(['TEST1', 'TEST2', 'TEST3'], monitor.poll())
+    self.assertEquals(['TEST1,TEST2,TEST3'], self.status_calls)
+    self.assertEquals('RUNNING', monitor.state('TEST1'))
+    self.assertEquals('FAILED', monitor.state('TEST2'))
+    self.assertEquals('UNSUBMITTED', monitor.state('TEST3'))
+    self.assertEquals('Explosions.', monitor.status('TEST2')['error_message'])
+    self.assertEquals(['TEST1'], monitor.active())
+
+  def testTaskMonitorTransitions(self):
+    """Verifies that TaskMonitor calls back on state changes only."""
+    now = [0]
+    monitor = ee.batch.TaskMonitor(clock=lambda: now[0])
+    transitions = []
+    monitor.on_transition(lambda *args: transitions.append(args[:3]))
+    own = []
+    monitor.add('TASKA', callback=lambda *args: own.append(args[2]))
+    monitor.add('TASKB')
+
+    self.task_states = {'TASKA': 'READY', 'TASKB': 'RUNNING'}
+    monitor.poll()
+    now[0] = 100
+    self.task_states = {'TASKA': 'RUNNING', 'TASKB': 'RUNNING'}
+    self.assertEquals(['TASKA'], monitor.poll())
+    now[0] = 200
+    self.task_states = {'TASKA': 'COMPLETED', 'TASKB': 'RUNNING'}
+    monitor.poll()
+
+    self.assertEquals([
+        ('TASKA', None, 'READY'), ('TASKB', None, 'RUNNING'),
+        ('TASKA', 'READY', 'RUNNING'),
+        ('TASKA', 'RUNNING', 'COMPLETED'),
+    ], transitions)
+    self.assertEquals(['READY', 'RUNNING', 'COMPLETED'], own)
+    self.assertEquals(['TASKB'], monitor.active())
+
+  def testTaskMonitorIntervals(self):
+    """Verifies that TaskMonitor polls old tasks less often."""
+    now = [1000]
+    monitor = ee.batch.TaskMonitor(
+        min_interval=5, max_interval=60, clock=lambda: now[0])
+    self.task_states = {'NEW': 'RUNNING', 'OLD': 'RUNNING',
+                        'CANCELLING': 'CANCEL_REQUESTED'}
+    monitor.add('NEW')
+    monitor.add('OLD', since=900)
+    monitor.add('CANCELLING', since=0)
+    monitor.poll()
+    self.assertEquals(5, monitor.interval('NEW'))
+    self.assertEquals(20, monitor.interval('OLD'))
+    self.assertEquals(5, monitor.interval('CANCELLING'))
+    self.assertEquals(5, monitor.next_poll())
+
+    # Only the tasks that are due are polled.
+    now[0] = 1005
+    monitor.poll()
+    self.assertEquals('NEW,CANCELLING', self.status_calls[-1])
+
+    now[0] = 10000
+    self.assertEquals(60, monitor.interval('OLD'))
+
+  def testTaskMonitorWait(self):
+    """Verifies that TaskMonitor.wait() polls until the tasks finish."""
+    now = [0]
+    def Sleep(seconds):
+      now[0] += seconds
+      if now[0] >= 30:
+        self.task_states['TASKA'] = 'COMPLETED'
+    monitor = ee.batch.TaskMonitor(clock=lambda: now[0])
+    self.task_states = {'TASKA': 'RUNNING'}
+    monitor.add('TASKA')
+    self.assertFalse(monitor.wait(timeout=20, sleep=Sleep))
+    self.assertTrue(monitor.wait(sleep=Sleep))
+    self.assertEquals('COMPLETED', monitor.state('TASKA'))
+
   def testStringRepresentation(self):
     """Verifies the string representation of tasks."""
     tasks = ee.batch.Task.list()
@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 
 
+import BaseHTTPServer
+import SocketServer
+import threading
+
 import httplib2
 import mock
 import unittest
@@ -85,6 +89,82 @@ class DataTest(unittest.TestCase):
       self.assertEqual('{"error": {"code": 400, "message": "bar"}}',
                        ee.data.send_('/foo', {}, opt_raw=True))
 
+  def testGetValues(self):
+    calls = []
+    def MockSend(path, params, *unused_args):
+      calls.append((path, params))
+      return {'a': 1, 'b': [2, 3]}
+    a = ee.ComputedObject('String.cat', {'string1': 'x', 'string2': 'y'})
+    b = ee.ComputedObject('List.reverse', {'list': [3, 2]})
+    with mock.patch.object(ee.data, 'send_', new=MockSend):
+      self.assertEqual({'a': 1, 'b': [2, 3]}, ee.data.getValues({'a': a, 'b': b}))
+    self.assertEqual(1, len(calls))
+    self.assertEqual('/value', calls[0][0])
+    self.assertEqual(ee.serializer.toJSON({'a': a, 'b': b}), calls[0][1]['json'])
+
+  def testGetValuesList(self):
+    a = ee.ComputedObject('String.cat', {'string1': 'x', 'string2': 'y'})
+    with mock.patch.object(ee.data, 'send_', return_value=['xy', 'xy']) as send:
+      self.assertEqual(('xy', 'xy'), ee.data.getValues((a, a)))
+      self.assertEqual(ee.serializer.toJSON((a, a)), send.call_args[0][1]['json'])
+
+  def testConnectionReuse(self):
+    with StubServer() as server:
+      for _ in range(5):
+        self.assertEqual('bar', ee.data.send_('/foo', {}))
+      self.assertEqual(5, server.requests)
+      self.assertEqual(1, server.connections)
+
+  def testIdleConnectionsEvicted(self):
+    with StubServer() as server:
+      with mock.patch.object(ee.data, '_connection_idle_s', 0):
+        ee.data.send_('/foo', {})
+        ee.data.send_('/foo', {})
+      self.assertEqual(2, server.connections)
+
+  def testSingleFlight(self):
+    release = threading.Event()
+    calls = []
+    def Request(unused_self, unused_url, method, body, headers):
+      _ = method, headers  # unused kwargs
+      calls.append(body)
+      release.wait(5)
+      response = httplib2.Response({'status': 200,
+                                    'content-type': 'application/json'})
+      return response, '{"data": {"value": 1}}'
+
+    results = []
+    def Call(params):
+      results.append(ee.data.send_('/value', params))
+
+    before = ee.data.getSingleFlightStats()
+    with mock.patch('httplib2.Http.request', new=Request):
+      threads = [threading.Thread(target=Call, args=({'json': 'a', 'x': 1},))
+                 for _ in range(3)]
+      threads.append(threading.Thread(target=Call, args=({'json': 'b'},)))
+      for thread in threads:
+        thread.start()
+      while (len(calls) < 2 or ee.data.getSingleFlightStats()['coalesced'] -
+             before['coalesced'] < 2):
+        release.wait(0.01)
+      release.set()
+      for thread in threads:
+        thread.join(5)
+    after = ee.data.getSingleFlightStats()
+
+    self.assertEqual(2, len(calls))
+    self.assertEqual([{'value': 1}] * 4, results)
+    self.assertEqual(2, after['upstream'] - before['upstream'])
+    self.assertEqual(2, after['coalesced'] - before['coalesced'])
+
+  def testSingleFlightSharesErrors(self):
+    with DoStubHttp(500, 'application/json',
+                    '{"error": {"code": 500, "message": "bar"}}'):
+      with self.assertRaises(ee.ee_exception.EEException) as cm:
+        ee.data.send_('/value', {})
+      self.assertEqual('bar', cm.exception.message)
+    self.assertEqual({}, ee.data._flights)
+
 
 def DoStubHttp(status, mime, resp_body):
   """Context manager for temporarily overriding Http."""
@@ -98,6 +178,56 @@ def DoStubHttp(status, mime, resp_body):
   return mock.patch('httplib2.Http.request', new=Request)
 
 
+class StubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """A local keep-alive API server that counts the connections made to it.
+
+  Used as a context manager, it points ee.data at itself.
+  """
+
+  daemon_threads = True
+
+  def __init__(self):
+    BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), _StubHandler)
+    self.connections = 0
+    self.requests = 0
+
+  def __enter__(self):
+    threading.Thread(target=self.serve_forever).start()
+    ee.data.reset()
+    ee.data.initialize(
+        None, 'http://127.0.0.1:%d/api' % self.server_address[1], None)
+    return self
+
+  def __exit__(self, *unused_args):
+    ee.data.reset()
+    self.shutdown()
+    self.server_close()
+
+
+class _StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+  # Buffer the response so it goes out in one write, as a real server's would.
+  wbufsize = -1
+
+  def setup(self):
+    BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+    self.server.connections += 1
+
+  def do_POST(self):
+    self.rfile.read(int(self.headers.getheader('content-length') or 0))
+    self.server.requests += 1
+    body = '{"data": "bar"}'
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('Connection', 'keep-alive')
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *unused_args):
+    pass
+
+
 class StubResponse(object):
 
   def __init__(self, status):
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Tests for the ee.futures module."""
+
+
+
+import threading
+import time
+
+import unittest
+
+import ee
+from ee import apitestcase
+from ee import futures
+
+
+class FuturesTest(apitestcase.ApiTestCase):
+
+  def tearDown(self):
+    # Let abandoned calls drain so no worker outlives the test.
+    end = time.time() + 5
+    while futures._executor._workers and time.time() < end:
+      time.sleep(0.001)
+
+  def testSubmit(self):
+    future = futures.submit(lambda x, y: x + y, 1, y=2)
+    self.assertEqual(3, future.result(5))
+    self.assertTrue(future.done())
+    self.assertFalse(future.cancelled())
+
+  def testException(self):
+    def Fail():
+      raise ee.EEException('failed')
+    future = futures.submit(Fail)
+    with self.assertRaises(ee.EEException) as cm:
+      future.result(5)
+    self.assertEqual('failed', cm.exception.message)
+
+  def testCallsRunConcurrently(self):
+    barrier = threading.Event()
+    started = []
+    def Wait(i):
+      started.append(i)
+      if len(started) == 3:
+        barrier.set()
+      return barrier.wait(5) and i
+    results = futures.gather([futures.submit(Wait, i) for i in range(3)], 5)
+    self.assertEqual([0, 1, 2], results)
+
+  def testBoundedWorkers(self):
+    executor = futures.Executor(max_workers=2)
+    lock = threading.Lock()
+    running = [0, 0]  # current, maximum
+    def Work():
+      with lock:
+        running[0] += 1
+        running[1] = max(running)
+      time.sleep(0.01)
+      with lock:
+        running[0] -= 1
+    futures.wait([executor.submit(Work) for _ in range(6)], 5)
+    self.assertEqual(2, running[1])
+
+  def testCancelBeforeStart(self):
+    executor = futures.Executor(max_workers=1)
+    release = threading.Event()
+    blocker = executor.submit(release.wait, 5)
+    calls = []
+    queued = executor.submit(calls.append, 1)
+    self.assertTrue(queued.cancel())
+    release.set()
+    blocker.result(5)
+    futures.wait([executor.submit(lambda: None)], 5)
+    self.assertEqual([], calls)
+    self.assertTrue(queued.cancelled())
+    self.assertRaises(futures.CancelledError, queued.result)
+
+  def testDeadline(self):
+    release = threading.Event()
+    future = futures.submit(release.wait, 5, deadline_ms=10)
+    self.assertRaises(futures.DeadlineExceededError, future.result)
+    release.set()
+
+  def testWaitTimeout(self):
+    release = threading.Event()
+    slow = futures.submit(release.wait, 5)
+    fast = futures.submit(lambda: 1)
+    done, not_done = futures.wait([fast, slow], 0.05)
+    self.assertEqual([fast], done)
+    self.assertEqual([slow], not_done)
+    release.set()
+
+  def testGatherCancelsOnFailure(self):
+    release = threading.Event()
+    def Fail():
+      raise ee.EEException('failed')
+    slow = futures.submit(release.wait, 5)
+    self.assertRaises(
+        ee.EEException, futures.gather, [futures.submit(Fail), slow])
+    self.assertTrue(slow.cancelled())
+    release.set()
+
+  def testDoneCallback(self):
+    future = futures.submit(lambda: 1)
+    future.result(5)
+    calls = []
+    future.add_done_callback(calls.append)
+    self.assertEqual([future], calls)
+
+  def testGetInfoAsync(self):
+    result = ee.ApiFunction.call_('DateRange', 1, 2)
+    self.assertEquals({'value': 'fakeValue'}, result.getInfoAsync().result(5))
+
+
+if __name__ == '__main__':
+  unittest.main()
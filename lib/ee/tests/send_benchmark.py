@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""Benchmarks pooled keep-alive connections in ee.data.send_.
+
+Compares the time per call against a local stub server when connections are
+reused with the time when every call has to open a new one.
+"""
+
+
+
+import time
+
+import mock
+
+import ee
+from data_test import StubServer
+
+CALLS = 200
+
+
+def TimePerCall(idle_s):
+  with StubServer() as server:
+    with mock.patch.object(ee.data, '_connection_idle_s', idle_s):
+      start = time.time()
+      for _ in range(CALLS):
+        ee.data.send_('/foo', {})
+      elapsed = time.time() - start
+    return elapsed / CALLS, server.connections
+
+
+def main():
+  pooled, pooled_connections = TimePerCall(60)
+  fresh, fresh_connections = TimePerCall(0)
+  print 'pooled: %.3f ms/call over %d connection(s)' % (
+      pooled * 1e3, pooled_connections)
+  print 'fresh:  %.3f ms/call over %d connection(s)' % (
+      fresh * 1e3, fresh_connections)
+  print 'saved:  %.3f ms/call' % ((fresh - pooled) * 1e3)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""Benchmarks ee.serializer with and without memoize() on a REMAP classification.
+
+The graph mirrors remap.get_classified_from_fc: 13 predictor bands built from
+four assets, sampled under a collection of training points, a random forest
+trained on the samples and the composite classified with it. Each graph is
+serialized with the predictor image walked every time, then with it memoized
+as remap.predictor_image does, and the two outputs are checked to match.
+Memoizing saves the walk of the predictor image alone, so the saving is about
+the same for every training set and chain.
+"""
+
+import random
+import time
+
+import ee
+from ee import serializer
+
+REPEATS = 5
+
+
+def Call(name, **args):
+  return ee.ComputedObject(name, args)
+
+
+def PredictorImage():
+  bioclim = Call('Image.select', input=Call('Image.load', id='WORLDCLIM/V1/BIO'),
+                 bandSelectors=['bio01', 'bio12'],
+                 newNames=['Mean Annual Temperature', 'Annual Precipitation'])
+  elevation = Call('Image.rename',
+                   input=Call('Image.load', id='USGS/SRTMGL1_003'),
+                   names=['Elevation'])
+  slope = Call('Image.rename', input=Call('Terrain.slope', input=elevation),
+               names=['Slope'])
+  ls = Call('Image.load', id='users/JohnHWilshire/ls_8_cflte1_2k14to17_at_30m_ui8')
+  band = lambda name: Call('Image.select', input=ls, bandSelectors=[name])
+  nd = lambda a, b, name: Call('Image.rename', names=[name], input=Call(
+      'Image.normalizedDifference', input=ls, bandNames=[a, b]))
+  bands = [
+      bioclim, elevation, slope, ls,
+      nd('NIR', 'Red', 'NDVI'),
+      nd('Green', 'NIR', 'NDWI'),
+      Call('Image.rename', names=['WBI'], input=Call(
+          'Image.divide', image1=band('Blue'), image2=band('NIR'))),
+      Call('Image.rename', names=['BR'], input=Call(
+          'Image.subtract', image1=band('Blue'), image2=band('Red'))),
+      nd('Blue', 'Green', 'BG'),
+  ]
+  return Call('Image.unmask', input=Call('Image.addBands', dstImg=bands),
+              value=-20000)
+
+
+def Classified(points, predictors):
+  composite = Call('Image.select', input=predictors,
+                   bandSelectors=['NDVI', 'NDWI', 'Elevation', 'Slope'])
+  train_fc = Call('Collection', features=[
+      Call('Feature', metadata={'label': label},
+           geometry=Call('GeometryConstructors.Point', coordinates=[x, y]))
+      for x, y, label in points])
+  training = Call('Image.reduceRegions', image=composite, collection=train_fc,
+                  reducer=Call('Reducer.first'), scale=1)
+  classifier = Call('Classifier.train', features=training, classProperty='label',
+                    inputProperties=Call('Image.bandNames', image=composite),
+                    classifier=Call('Classifier.randomForest',
+                                    numberOfTrees=100, minLeafPopulation=13))
+  return Call('Image.classify', image=composite, classifier=classifier)
+
+
+def Chain(depth, predictors):
+  node = predictors
+  for i in range(depth):
+    node = Call('Image.add', image1=node, image2=Call('Image.constant', value=i))
+  return node
+
+
+def Time(obj):
+  start = time.time()
+  for _ in range(REPEATS):
+    serializer.toJSON(obj)
+  return (time.time() - start) / REPEATS
+
+
+def Compare(build):
+  """Times serializing build(predictors) without and with memoized predictors.
+
+  Args:
+    build: Builds the graph on top of the given predictor image.
+
+  Returns:
+    The scope entries, and the seconds per serialization without and with
+    memoizing.
+  """
+  plain = build(PredictorImage())
+  nodes = len(serializer.encode(plain)['scope'])
+  plain_time = Time(plain)
+  predictors = serializer.memoize(PredictorImage())
+  try:
+    memoized = build(predictors)
+    memoized_time = Time(memoized)
+    assert serializer.toJSON(memoized) == serializer.toJSON(plain)
+  finally:
+    del serializer._memoized[id(predictors)]  # pylint: disable=protected-access
+  return nodes, plain_time, memoized_time
+
+
+def main():
+  rand = random.Random(0)
+  nodes, plain, memoized = Compare(lambda p: p)
+  print 'predictor image  scope entries  ms/plain  ms/memoized  speedup'
+  print '%15s  %13d  %8.2f  %11.2f  %6.1fx' % (
+      '', nodes, plain * 1e3, memoized * 1e3, plain / memoized)
+  print
+  print 'training points  scope entries  ms/plain  ms/memoized  speedup'
+  for n in (100, 250, 500, 1000, 2000):
+    points = [(rand.uniform(136, 142), rand.uniform(-18, -12), i % 5 + 1)
+              for i in range(n)]
+    nodes, plain, memoized = Compare(lambda p: Classified(points, p))
+    print '%15d  %13d  %8.2f  %11.2f  %6.1fx' % (
+        n, nodes, plain * 1e3, memoized * 1e3, plain / memoized)
+  print
+  print 'chain depth  scope entries  ms/plain  ms/memoized  speedup'
+  for depth in (50, 100, 200, 400):
+    nodes, plain, memoized = Compare(lambda p: Chain(depth, p))
+    print '%11d  %13d  %8.2f  %11.2f  %6.1fx' % (
+        depth, nodes, plain * 1e3, memoized * 1e3, plain / memoized)
+
+
+if __name__ == '__main__':
+  main()
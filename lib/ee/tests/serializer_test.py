@@ -102,6 +102,42 @@ class SerializerTest(apitestcase.ApiTestCase):
     }
     self.assertEquals(expected1, json.loads(serializer.toJSON(test1)))
 
+  def testHashesIndependentOfScopeOrder(self):
+    """Verifies subtree hashes depend only on the content of the subtree."""
+    a = ee.Image(1).mask(ee.Image(2))   # pylint: disable-msg=no-member
+    b = ee.Image(2).mask(ee.Image(1))   # pylint: disable-msg=no-member
+
+    first = serializer.Serializer()
+    first._encodeValue(a)
+    first._encodeValue(b)
+    second = serializer.Serializer()
+    second._encodeValue(b)
+    second._encodeValue(a)
+
+    self.assertEquals(4, len(first._encoded))
+    self.assertEquals(set(first._encoded), set(second._encoded))
+    self.assertNotEquals(first._encoded, second._encoded)
+
+  def testMemoize(self):
+    """Verifies memoized objects encode the same without being walked."""
+    shared = ee.Image(1).mask(ee.Image(2))   # pylint: disable-msg=no-member
+    graph = lambda: [ee.Image(2).mask(shared), shared, ee.Image(2)]
+    expected = serializer.toJSON(graph())
+
+    self.assertIs(shared, serializer.memoize(shared))
+    def Fail(unused_encoder):
+      self.fail('Memoized object was encoded again.')
+    try:
+      shared.encode = Fail
+      self.assertEquals(expected, serializer.toJSON(graph()))
+      self.assertEquals(expected, serializer.toJSON(graph()))
+    finally:
+      del shared.encode
+
+    self.assertEquals(serializer.toJSON(shared, False),
+                      serializer.toJSON(ee.Image(1).mask(ee.Image(2)), False))
+    del serializer._memoized[id(shared)]
+
 
 if __name__ == '__main__':
   unittest.main()
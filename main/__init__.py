@@ -1,4 +1,5 @@
 from datastore import *
+from cache import *
 from shared import *
 from auth import *
 from remap_api import *
\ No newline at end of file
@@ -1,7 +1,9 @@
-import config, drive, ee, httplib2, json, oauth2client, remap, time, uuid
+import calendar, config, drive, ee, ee.deserializer, httplib2, json, logging, oauth2client, remap, time, uuid, webapp2, zipfile
 from datetime import datetime, timedelta
 from googleapiclient.discovery import build
-from google.appengine.api import taskqueue
+from google.appengine.api import taskqueue, urlfetch
+from google.appengine.ext import ndb
+from StringIO import StringIO
 from datetime import datetime, timedelta
 from datastore import *
 from shared import *
@@ -66,24 +68,146 @@ class Export(BaseHandler):
 		self.response.write(checkDatastoreProgress(self.session['email']))
 
 	def post(self):
+		""" Starts the export. With 'time_budget' (seconds) the finest scale expected to export in
+			that time is picked, and with 'estimate' the estimate is returned without exporting.
+		"""
+		data = json.loads(self.request.body)
+		scales = remap.parameters['export_scales'] + [ config.EXPORT_TIFF_SCALE ]
+		if data.get('export_scale', config.EXPORT_TIFF_SCALE) not in scales:
+			self.response.set_status(500)
+			self.response.write(json.dumps({
+				"message": "Unknown export scale %s, use one of %s." % (data['export_scale'], ', '.join(str(x) for x in sorted(set(scales))))
+			}))
+			return
+		estimate = None
+		if data.get('estimate') or data.get('time_budget'):
+			calibration = export_calibration()
+			area = remap.region_area(data['region'])
+			if data.get('time_budget'):
+				estimate = remap.auto_scale(data['region'], area, data['predictors'], float(data['time_budget']),
+					calibration, data.get('export_tiles'))
+			else:
+				estimate = remap.export_estimate(data['region'], area, data.get('export_scale', config.EXPORT_TIFF_SCALE),
+					data['predictors'], calibration, data.get('export_tiles'))
+			if data.get('estimate'):
+				self.response.write(json.dumps({'estimate': estimate}))
+				return
+			data['export_scale'] = estimate['scale']
 		datastoreProgress(self.session['email'], 'IN_PROGRESS')
 		taskqueue.add(
 			url = '/exportworker',
 			params = {
-				'data': self.request.body,
+				'data': json.dumps(data),
 				'ip': self.request.remote_addr,
 				'credentials': self.session['credentials'],
 				'email': self.session['email']
 			})
-		self.response.write(json.dumps({}))
+		self.response.write(json.dumps({'estimate': estimate} if estimate else {}))
+
+def export_calibration():
+	""" The export estimate calibration from the most recent export logs.
+	"""
+	logs = ExportLog.query().order(-ExportLog.date).fetch(EXPORT_LOG_SIZE)
+	return remap.calibrate_exports([
+		log.to_dict(include=['mode', 'pixels', 'predictors', 'tiles', 'seconds']) for log in logs
+	])
+
+# running export tasks are polled together, this often at first and less often the longer they run
+EXPORT_POLL_START = 10 # seconds
+EXPORT_POLL_MAX = 5 * 60 # seconds
+EXPORT_POLL_STALE = 15 * 60 # seconds, a poll this overdue has failed for good and a new one is queued
+DOWNLOAD_DEADLINE = 5 * 60 # seconds, for fetching a direct download
+EXPORT_LOG_SIZE = 200 # most recent exports the estimates are calibrated from
+
+def enqueue_stage(job, countdown=0):
+	""" Runs the current stage of the export job in a task queue task after countdown seconds.
+		In a transaction the task is only queued if the transaction commits.
+	"""
+	taskqueue.add(
+		url = '/exportstage',
+		params = {'job': job.key.id(), 'stage': job.stage},
+		countdown = countdown,
+		transactional = ndb.in_transaction())
+
+def enqueue_poll(poller, countdown):
+	""" Queues the next poll of the running exports after countdown seconds, in the transaction
+		the poller is put in. The poll queued before it, if any, stops without polling.
+	"""
+	poller.chain += 1
+	poller.due = datetime.utcnow() + timedelta(seconds=countdown)
+	taskqueue.add(
+		url = '/exportpoll',
+		params = {'chain': poller.chain},
+		countdown = countdown,
+		transactional = True)
+
+def get_poller():
+	return ExportPoller.get_by_id(EXPORT_POLLER) or ExportPoller(id=EXPORT_POLLER)
+
+@ndb.transactional
+def watch_export(job):
+	""" Adds the export job to the polled ones. A poll is queued unless one is due soon anyway.
+	"""
+	poller = get_poller()
+	poller.jobs.append(job.key.id())
+	now = datetime.utcnow()
+	if (poller.due is None or poller.due > now + timedelta(seconds=EXPORT_POLL_START)
+			or poller.due < now - timedelta(seconds=EXPORT_POLL_STALE)):
+		enqueue_poll(poller, EXPORT_POLL_START)
+	poller.put()
+
+@ndb.transactional
+def reschedule_poll(chain, finished, countdown):
+	""" Drops the finished job ids from the polled ones and queues the next poll, if the poll of
+		chain is still the queued one and there are jobs left.
+	"""
+	poller = get_poller()
+	if poller.chain != chain:
+		return # a newer poll was queued while polling, it polls the jobs left
+	poller.jobs = [ job_id for job_id in poller.jobs if job_id not in finished ]
+	if poller.jobs:
+		enqueue_poll(poller, countdown)
+	else:
+		poller.due = None
+	poller.put()
+
+def update_job(key, check, change):
+	""" Changes the stored export job in a transaction, if check(job) still holds for it.
+		Returns the changed job, or None if it had moved on already, so polls and stages that
+		are retried or run side by side change a job once.
+	"""
+	@ndb.transactional
+	def update():
+		job = key.get()
+		if job is None or not check(job):
+			return None
+		change(job)
+		job.put()
+		return job
+	return update()
+
+def set_stage(job, stage):
+	""" Moves the job on to stage, queueing the task of the stage unless the export has ended.
+		An ended job doesn't keep the user's credentials, they aren't needed any more.
+	"""
+	job.stage = stage
+	if stage in ('done', 'error'):
+		job.credentials = None
+	else:
+		enqueue_stage(job)
 
 class ExportWorker(GetMapData):
+	""" Downloads small exports straight into the user's drive. Larger ones start export tasks,
+		the rest of those exports is done by ExportPoll and ExportStage.
+	"""
 	def post(self):
+		start = time.time()
+		scale = self.data.get('export_scale', config.EXPORT_TIFF_SCALE)
 		# build the metadata file
 		header = ['Class, GeoTIFF Value']
 		meta_list = header + ["%s, %s" % (c['name'] , i + 1) for i, c  in enumerate(self.classes)]
 		# meta_list.append('missing_data, 0')
-		meta_list.append('pixel_scale_m, ' + str(config.EXPORT_TIFF_SCALE))
+		meta_list.append('pixel_scale_m, ' + str(scale))
 		meta_file = '\n'.join(meta_list)
 
 		datastore(self.request.get( 'ip'), 
@@ -98,46 +222,277 @@ class ExportWorker(GetMapData):
 		export_time = time.ctime()
 		file_name = 'REMAP GeoTIFF Export ' + export_time + '.tif'
 
-		classified = remap.get_classified_from_fc(self.train_fc, self.predictors).clip(self.region)
+		classified = remap.get_classified_from_fc(self.train_fc, self.predictors, self.past).clip(self.region)
 
-		task = ee.batch.Export.image(
-			image=classified,
-			description=file_name,
-			config={
-				'driveFileNamePrefix': temp_file_prefix,
-				'maxPixels': 1e10,
-				'scale': config.EXPORT_TIFF_SCALE,
-				'region': json.dumps([[x['lng'], x['lat']] for x in self.data['region']])
-			})
-		# Kangaroo Island CSV points
-		# scale  30 took 1335.49342012 seconds (22 mins)
-		# scale 100 took 177.377995968 seconds (3 mins)
+		# the drive file prefix doubles as the job id, it is unique
+		job = ExportJob(
+			id = temp_file_prefix,
+			emailAddress = self.request.get('email'),
+			credentials = self.request.get('credentials'),
+			stage = 'poll',
+			fileName = file_name,
+			exportTime = export_time,
+			metadata = meta_file,
+			scale = scale,
+			pixels = remap.export_pixels(self.data['region'], scale, self.area),
+			predictors = len(self.predictors))
 
-		task.start()
-		while task.active():
-			time.sleep(10)
+		grid = remap.export_grid(self.data['region'], scale)
+		job.mode = remap.export_mode(grid, self.area, self.data.get('export_tiles'))
+		if job.mode == 'download':
+			try:
+				self.download(job, classified.toByte(), grid)
+				log_export(job, time.time() - start)
+				return
+			except (ee.EEException, urlfetch.Error, zipfile.BadZipfile) as e:
+				logging.warning('direct download failed, exporting instead: %s' % e)
+				job.mode = remap.export_mode(grid, self.area, self.data.get('export_tiles'), download=False)
+
+		if job.mode == 'tiled':
+			# the tiles run side by side, exporting a large region in a fraction of the time
+			image = classified.toByte()
+			job.grid = grid
+			job.tiles = remap.export_tiles(self.data['region'], job.grid, self.area)
+			job.image = ee.serializer.toJSON(image)
+			job.metadata += '\npixel_size_deg, %r' % job.grid['res']
+			# the job is stored with its tiles first and each task is recorded before it starts,
+			# so a failure part way through can't leave tasks running that no job knows of
+			job.put()
+			try:
+				for i in range(len(job.tiles)):
+					task = tile_task(job, i, image)
+					start_tile(job, i, task)
+					job.put()
+					task.start()
+			except Exception:
+				self.cancel_tiles(job)
+				raise
+		else:
+			task = ee.batch.Export.image(
+				image=classified,
+				description=file_name,
+				config={
+					'driveFileNamePrefix': temp_file_prefix,
+					'maxPixels': 1e10,
+					'scale': scale,
+					'region': json.dumps([[x['lng'], x['lat']] for x in self.data['region']])
+				})
+			# Kangaroo Island CSV points
+			# scale  30 took 1335.49342012 seconds (22 mins)
+			# scale 100 took 177.377995968 seconds (3 mins)
+			task.start()
+			job.taskId = task.id
+		job.put()
+		watch_export(job)
+
+	def cancel_tiles(self, job):
+		""" Cancels the tile tasks of a job that failed to start them all, and ends the job.
+		"""
+		for tile in job.tiles:
+			if tile.get('taskId'):
+				try:
+					ee.batch.Task(tile['taskId']).cancel()
+				except ee.EEException as e:
+					logging.warning('could not cancel export tile %s: %s' % (tile['taskId'], e))
+		set_stage(job, 'error')
+		job.put()
+		datastoreProgress(job.emailAddress, 'ERROR')
+
+	def download(self, job, image, grid):
+		""" Downloads the image on the export grid straight from earth engine and uploads it to the
+			user's drive, skipping the batch queue. Only for small images, the download is held in memory.
+		"""
+		url = image.getDownloadURL({
+			'name': job.key.id(),
+			'crs': remap.EXPORT_CRS,
+			'crs_transform': json.dumps(remap.tile_transform(grid)),
+			'dimensions': json.dumps([grid['width'], grid['height']])
+		})
+		response = urlfetch.fetch(url, deadline=DOWNLOAD_DEADLINE)
+		if response.status_code != 200:
+			raise ee.EEException('Download failed with status %d.' % response.status_code)
+		archive = zipfile.ZipFile(StringIO(response.content))
+		tif = [ name for name in archive.namelist() if name.endswith('.tif') ][0]
+		user_drive_helper = drive.DriveHelper(oauth2client.client.OAuth2Credentials.from_json(job.credentials))
+		job.metadata += '\npixel_size_deg, %r' % grid['res']
+		folder = create_export_folder(user_drive_helper, job)
+		user_drive_helper.CreateFile(job.fileName, archive.read(tif), folder, 'image/tiff')
+		set_stage(job, 'done')
+		job.put()
+		datastoreProgress(job.emailAddress, 'COMPLETED')
+		print('Done!')
+
+def create_export_folder(user_drive_helper, job):
+	""" Creates the folder in the user's drive that the export goes in, with the metadata file.
+	"""
+	folder = user_drive_helper.CreateFolder('REMAP Export Folder ' + job.exportTime)
+	user_drive_helper.CreateFile('REMAP metadata ' + job.exportTime + '.csv', job.metadata, folder)
+	return folder
 
-		state = task.status()['state']
+def tile_prefix(job, i):
+	""" The drive file name prefix of tile i of the job, the tiles are found by the job id.
+	"""
+	return '%s-tile-%02d' % (job.key.id(), i + 1)
+
+def tile_file_name(job, i):
+	return '%s tile %02d.tif' % (job.fileName[:-len('.tif')], i + 1)
+
+def tile_task(job, i, image):
+	""" The export task of tile i of the job on the job's shared grid, not started yet.
+	"""
+	tile = job.tiles[i]
+	return ee.batch.Export.image(
+		image=image,
+		description=tile_file_name(job, i),
+		config={
+			'driveFileNamePrefix': tile_prefix(job, i),
+			'maxPixels': 1e10,
+			'crs': remap.EXPORT_CRS,
+			'crs_transform': ','.join(repr(x) for x in remap.tile_transform(job.grid, tile)),
+			'dimensions': '%dx%d' % (tile['width'], tile['height']),
+			'region': json.dumps(remap.tile_region(job.grid, tile))
+		})
+
+def start_tile(job, i, task):
+	""" Records task as the latest attempt at tile i of the job.
+	"""
+	tile = job.tiles[i]
+	tile['taskId'] = task.id
+	tile['attempts'] = tile.get('attempts', 0) + 1
+	tile['state'] = None
+
+class ExportPoll(webapp2.RequestHandler):
+	""" Polls the earth engine tasks of all the exports waiting on them with one request,
+		moves the finished ones on to their next stage and queues the next poll.
+		Only the poll queued last runs, so there is one chain of polls however many exports run.
+	"""
+	def post(self):
+		chain = int(self.request.get('chain', 0))
+		poller = ExportPoller.get_by_id(EXPORT_POLLER)
+		if poller is None or poller.chain != chain:
+			return # a newer poll has been queued
+		keys = [ ndb.Key(ExportJob, job_id) for job_id in poller.jobs ]
+		monitor = ee.batch.TaskMonitor(EXPORT_POLL_START, EXPORT_POLL_MAX)
+		for job in ndb.get_multi(keys):
+			if job is None or job.stage != 'poll':
+				continue
+			since = calendar.timegm(job.started.utctimetuple())
+			if job.tiles:
+				for i, tile in enumerate(job.tiles):
+					if tile['state'] != ee.batch.Task.State.COMPLETED:
+						monitor.add(tile['taskId'],
+							callback = lambda task_id, old_state, state, status, key=job.key, i=i: self.update_tile(key, i, task_id, state, status),
+							since = since)
+			else:
+				monitor.add(job.taskId,
+					callback = lambda task_id, old_state, state, status, key=job.key: self.update(key, task_id, state, status),
+					since = since)
+		monitor.poll()
+		finished = [ key.id() for key, job in zip(keys, ndb.get_multi(keys)) if job is None or job.stage != 'poll' ]
+		# restarted tiles aren't in the monitor yet
+		wait = monitor.next_poll()
+		reschedule_poll(chain, finished, EXPORT_POLL_START if wait is None else wait)
+
+	def update(self, key, task_id, state, status):
+		if state in ee.batch.TaskMonitor.ACTIVE_STATES:
+			return
+		polling = lambda job: job.stage == 'poll' and job.taskId == task_id
 		if state == ee.batch.Task.State.COMPLETED:
+			self.copy(update_job(key, polling, lambda job: set_stage(job, 'copy')), status)
+		else:
+			self.fail(update_job(key, polling, lambda job: set_stage(job, 'error')))
+
+	def copy(self, job, status):
+		""" Logs the job that moved on to its copy. The copy takes about as long for any export,
+			so the log is of the earth engine tasks.
+		"""
+		if job and job.stage == 'copy':
 			print('Done, Copying ...')
+			finished = status.get('update_timestamp_ms', time.time() * 1e3) / 1e3
+			log_export(job, finished - calendar.timegm(job.started.utctimetuple()))
 
-			files = APP_DRIVE_HELPER.GetExportedFiles(temp_file_prefix)
-			credentials = oauth2client.client.OAuth2Credentials.from_json(self.request.get('credentials'))
+	def fail(self, job):
+		if job:
+			datastoreProgress(job.emailAddress, 'ERROR')
+			print('Error')
+
+	def update_tile(self, key, i, task_id, state, status):
+		""" Records the state of a finished tile, a failed tile is restarted up to remap.TILE_RETRIES
+			times before the whole export fails. The job moves on once all its tiles completed.
+			Only the first poll to see the latest attempt at the tile end acts on it.
+		"""
+		if state in ee.batch.TaskMonitor.ACTIVE_STATES:
+			return
+		polling = lambda job: job.stage == 'poll' and job.tiles[i]['taskId'] == task_id and job.tiles[i]['state'] is None
+		if state == ee.batch.Task.State.COMPLETED:
+			def complete(job):
+				job.tiles[i]['state'] = state
+				if all(t['state'] == state for t in job.tiles):
+					set_stage(job, 'copy')
+			self.copy(update_job(key, polling, complete), status)
+			return
+		job = key.get()
+		if job is None or not polling(job):
+			return
+		if job.tiles[i]['attempts'] <= remap.TILE_RETRIES:
+			logging.warning('export tile %d of %d %s, restarting' % (i + 1, len(job.tiles), state.lower()))
+			# started only once its id is recorded, a poll that lost the race never starts its task
+			task = tile_task(job, i, ee.deserializer.fromJSON(job.image))
+			if update_job(key, polling, lambda job: start_tile(job, i, task)):
+				task.start()
+		else:
+			job = update_job(key, polling, lambda job: set_stage(job, 'error'))
+			if job:
+				for t in job.tiles:
+					if t['state'] != ee.batch.Task.State.COMPLETED:
+						ee.batch.Task(t['taskId']).cancel()
+			self.fail(job)
+
+class ExportStage(webapp2.RequestHandler):
+	""" Runs one stage of a finished export job, copy -> cleanup, and queues the next one.
+	"""
+	def post(self):
+		job = ExportJob.get_by_id(self.request.get('job'))
+		if job is None or job.stage != self.request.get('stage'):
+			return # a retry of a stage that has already run
+		getattr(self, job.stage)(job)
+
+	def advance(self, job, stage):
+		""" Moves the job on from the stage that ran, returns None if a repeat of the stage already has.
+		"""
+		return update_job(job.key, lambda stored: stored.stage == job.stage, lambda stored: set_stage(stored, stage))
+
+	def copy(self, job):
+		files = APP_DRIVE_HELPER.GetExportedFiles(job.key.id())
+		credentials = oauth2client.client.OAuth2Credentials.from_json(job.credentials)
+		for f in files:
+			APP_DRIVE_HELPER.GrantAccess(f['id'], job.emailAddress)
+		user_drive_helper = drive.DriveHelper(credentials)
+		if len(files) > 0:
+			folder = create_export_folder(user_drive_helper, job)
+			if job.tiles:
+				names = [ tile_file_name(job, i) for i in range(len(job.tiles)) ]
+				user_drive_helper.CreateFile(job.fileName[:-len('.tif')] + '.vrt',
+					remap.tile_vrt(job.grid, job.tiles, names), folder, 'text/xml')
 			for f in files:
-				APP_DRIVE_HELPER.GrantAccess(f['id'], self.request.get('email'))
-			user_drive_helper = drive.DriveHelper(credentials)
-			if len(files) > 0:
-				folder = user_drive_helper.CreateFolder('REMAP Export Folder ' + export_time)
-				user_drive_helper.CreateFile('REMAP metadata ' + export_time + '.csv', meta_file, folder)
-				for f in files:
-					try: 	# will fail if the user doesn't have the right permissions
-								# just ignore it since it might have accidentally found someone else's file
-						user_drive_helper.CopyFile(f['id'], file_name, folder)
-					except:
-						pass
-				APP_DRIVE_HELPER.DeleteFile(f['id'])
-			datastoreProgress(self.request.get('email'), 'COMPLETED')
+				try: 	# will fail if the user doesn't have the right permissions
+							# just ignore it since it might have accidentally found someone else's file
+					user_drive_helper.CopyFile(f['id'], self.file_name(job, f), folder)
+				except:
+					pass
+		self.advance(job, 'cleanup')
+
+	def file_name(self, job, f):
+		""" The name of the copy of the exported file f, tiles are named as in the job's VRT.
+		"""
+		for i in range(len(job.tiles or [])):
+			if f['title'].startswith(tile_prefix(job, i)):
+				return tile_file_name(job, i)
+		return job.fileName
+
+	def cleanup(self, job):
+		for f in APP_DRIVE_HELPER.GetExportedFiles(job.key.id()):
+			APP_DRIVE_HELPER.DeleteFile(f['id'])
+		if self.advance(job, 'done'):
+			datastoreProgress(job.emailAddress, 'COMPLETED')
 			print('Done!')
-		else:
-			datastoreProgress(self.request.get('email'), 'ERROR')
-			print('Error')
\ No newline at end of file
@@ -0,0 +1,149 @@
+import ee, hashlib, json, logging, threading, time, webapp2
+from datetime import datetime, timedelta
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+from datastore import *
+
+# map ids and tokens handed out by earth engine stop working after about a day,
+# anything that holds on to them has to be evicted well before then
+MAP_TOKEN_TTL = 6 * 60 * 60 # seconds
+# predictor samples never go stale, this is the longest memcache accepts
+SAMPLE_TTL = 30 * 24 * 60 * 60 # seconds
+CACHE_NAMESPACE = 'remap'
+# map ids are refreshed in the background once they are this close to expiring
+MAP_ID_REFRESH = 30 * 60 # seconds
+MAP_ID_CACHE_SIZE = 500 # map ids kept by each instance
+SWEEP_BATCH = 500 # expired cache entries deleted at a time
+
+_map_ids = {}
+_map_id_refreshes = set()
+_map_id_lock = threading.Lock()
+
+def cache_key(*parts):
+	""" Returns a content addressed key for the given json serialisable parts.
+		Dictionaries are dumped with sorted keys so equal inputs always give the same key.
+	"""
+	canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+	return hashlib.sha1(canonical).hexdigest()
+
+def cache_get(key):
+	""" Looks up a key in memcache, then falls back to the datastore.
+		Returns None on a miss or if the entry has expired.
+	"""
+	value = memcache.get(key, namespace=CACHE_NAMESPACE)
+	if value is not None:
+		return value
+	entry = CacheEntry.get_by_id(key)
+	if entry is None:
+		return None
+	ttl = (entry.expires - datetime.utcnow()).total_seconds()
+	if ttl <= 0:
+		entry.key.delete()
+		return None
+	# warm memcache back up for the rest of the entry's life
+	memcache.set(key, entry.value, time=int(ttl), namespace=CACHE_NAMESPACE)
+	return entry.value
+
+def cache_set(key, value, ttl):
+	""" Stores a json serialisable value under key for ttl seconds in both memcache and the datastore.
+	"""
+	memcache.set(key, value, time=ttl, namespace=CACHE_NAMESPACE)
+	try:
+		CacheEntry(id=key, value=value, expires=datetime.utcnow() + timedelta(seconds=ttl)).put()
+	except Exception as e:
+		# the datastore copy is only a fallback, memcache still has the value
+		logging.warning('failed to write cache entry %s: %s' % (key, e))
+
+def cache_get_multi(keys):
+	""" Looks up several keys at once, see cache_get.
+		Returns a dictionary of the keys that were found and their values.
+	"""
+	found = memcache.get_multi(keys, namespace=CACHE_NAMESPACE)
+	missing = [ key for key in keys if key not in found ]
+	if not missing:
+		return found
+	now = datetime.utcnow()
+	warm, expired, ttl = {}, [], None
+	for key, entry in zip(missing, ndb.get_multi([ ndb.Key(CacheEntry, key) for key in missing ])):
+		if entry is None:
+			continue
+		if entry.expires <= now:
+			expired.append(entry.key)
+			continue
+		found[key] = warm[key] = entry.value
+		left = (entry.expires - now).total_seconds()
+		ttl = left if ttl is None else min(ttl, left)
+	if expired:
+		ndb.delete_multi(expired)
+	if warm:
+		# warm memcache back up until the first of them expires
+		memcache.set_multi(warm, time=int(ttl), namespace=CACHE_NAMESPACE)
+	return found
+
+def cache_set_multi(values, ttl):
+	""" Stores a dictionary of keys and json serialisable values for ttl seconds, see cache_set.
+	"""
+	memcache.set_multi(values, time=ttl, namespace=CACHE_NAMESPACE)
+	expires = datetime.utcnow() + timedelta(seconds=ttl)
+	try:
+		ndb.put_multi([ CacheEntry(id=key, value=value, expires=expires) for key, value in values.items() ])
+	except Exception as e:
+		logging.warning('failed to write %d cache entries: %s' % (len(values), e))
+
+def sweep_cache():
+	""" Deletes the datastore cache entries that have expired, most keys are never read again
+		so reads alone don't clear them out. Returns how many were deleted.
+	"""
+	now = datetime.utcnow()
+	deleted = 0
+	while True:
+		keys = CacheEntry.query(CacheEntry.expires <= now).fetch(SWEEP_BATCH, keys_only=True)
+		if not keys:
+			return deleted
+		ndb.delete_multi(keys)
+		deleted += len(keys)
+
+class CacheSweep(webapp2.RequestHandler):
+	""" Run daily by cron, see cron.yaml.
+	"""
+	def get(self):
+		logging.info('deleted %d expired cache entries' % sweep_cache())
+
+def cached_map_id(key, image, vis):
+	""" Returns the mapid and token of image.getMapId(vis) under key, from this instance or memcache
+		when possible. Only use it for layers that are the same for every user. Entries close to
+		expiring are refreshed in the background, so popular layers never wait for earth engine.
+	"""
+	now = time.time()
+	entry = _map_ids.get(key)
+	if entry is None:
+		entry = memcache.get(key, namespace=CACHE_NAMESPACE)
+		if entry is not None:
+			_keep_map_id(key, entry)
+	if entry is None or entry['expires'] <= now:
+		entry = _new_map_id(key, image, vis)
+	elif entry['expires'] - now < MAP_ID_REFRESH:
+		with _map_id_lock:
+			refresh = key not in _map_id_refreshes
+			_map_id_refreshes.add(key)
+		if refresh:
+			future = ee.futures.submit(_new_map_id, key, image, vis)
+			future.add_done_callback(lambda f: _map_id_refreshes.discard(key))
+	return entry['map_id']
+
+def _new_map_id(key, image, vis):
+	m = image.getMapId(vis)
+	entry = {
+		'map_id': {'mapid': m['mapid'], 'token': m['token']},
+		'expires': time.time() + MAP_TOKEN_TTL
+	}
+	_keep_map_id(key, entry)
+	memcache.set(key, entry, time=MAP_TOKEN_TTL, namespace=CACHE_NAMESPACE)
+	return entry
+
+def _keep_map_id(key, entry):
+	with _map_id_lock:
+		if key not in _map_ids and len(_map_ids) >= MAP_ID_CACHE_SIZE:
+			# make room by dropping the entry closest to expiring
+			del _map_ids[min(_map_ids, key=lambda k: _map_ids[k]['expires'])]
+		_map_ids[key] = entry
@@ -23,6 +23,56 @@ class Query(ndb.Model):
 	isDrive = ndb.BooleanProperty()
 	date = ndb.DateTimeProperty(auto_now_add=True)
 
+class CacheEntry(ndb.Model):
+	value = ndb.JsonProperty(indexed=False)
+	expires = ndb.DateTimeProperty()
+
+class ExportJob(ndb.Model):
+	""" An export in progress, it is moved through its stages by task queue tasks, see ExportPoll and ExportStage.
+	"""
+	emailAddress = ndb.StringProperty()
+	credentials = ndb.TextProperty()
+	taskId = ndb.StringProperty() # of a single export
+	grid = ndb.JsonProperty(indexed=False) # of a tiled export, see remap.export_grid
+	tiles = ndb.JsonProperty(indexed=False) # of a tiled export, with the taskId, attempts and state of each
+	image = ndb.TextProperty() # the serialized image of a tiled export, to restart failed tiles
+	mode = ndb.StringProperty() # one of remap.EXPORT_MODES
+	scale = ndb.FloatProperty()
+	pixels = ndb.IntegerProperty()
+	predictors = ndb.IntegerProperty() # how many were used
+	stage = ndb.StringProperty()
+	fileName = ndb.StringProperty()
+	exportTime = ndb.StringProperty()
+	metadata = ndb.TextProperty()
+	started = ndb.DateTimeProperty(auto_now_add=True)
+	updated = ndb.DateTimeProperty(auto_now=True)
+
+class ExportPoller(ndb.Model):
+	""" The one chain of ExportPoll tasks and the export jobs it polls, there is only EXPORT_POLLER.
+		The jobs are kept here so they are read by key, a query could miss one just started.
+	"""
+	jobs = ndb.StringProperty(repeated=True, indexed=False) # ids of the ExportJobs waiting on their tasks
+	chain = ndb.IntegerProperty(default=0, indexed=False) # the queued poll, the poll tasks of older ones stop
+	due = ndb.DateTimeProperty(indexed=False) # when the queued poll runs, None when none is
+
+EXPORT_POLLER = 'poller'
+
+class ExportLog(ndb.Model):
+	""" How long a finished export took, the export estimates are calibrated from these,
+		see remap.calibrate_exports.
+	"""
+	mode = ndb.StringProperty()
+	scale = ndb.FloatProperty()
+	pixels = ndb.IntegerProperty()
+	predictors = ndb.IntegerProperty()
+	tiles = ndb.IntegerProperty()
+	seconds = ndb.FloatProperty()
+	date = ndb.DateTimeProperty(auto_now_add=True)
+
+def log_export(job, seconds):
+	ExportLog(mode=job.mode, scale=job.scale, pixels=job.pixels, predictors=job.predictors,
+		tiles=len(job.tiles) if job.tiles else 1, seconds=seconds).put()
+
 def checkDatastoreProgress(email):
 	query = Progress.query(Progress.emailAddress == email).fetch()
 	if len(query) > 0:
@@ -1,10 +1,12 @@
-import config, ee, json, remap
+import config, ee, json, math, remap
 from datastore import *
+from cache import *
 from shared import *
 import logging
 
 class GetMapData(BaseHandler):
 	layers = []
+	past = False
 
 	def dispatch(self):
 		self.layers = []
@@ -25,6 +27,14 @@ class GetMapData(BaseHandler):
 
 		if 'past' in self.data:
 			self.past = self.data['past']
+
+		self.sampling = self.data.get('sampling', remap.parameters['sampling_mode'])
+		if self.sampling not in remap.SAMPLING_MODES:
+			self.response.set_status(500)
+			self.response.write(json.dumps({
+				"message": "Unknown sampling mode %s, use one of %s." % (self.sampling, ', '.join(remap.SAMPLING_MODES))
+			}))
+			return
 		
 
 		if 'classList' in self.data:
@@ -44,10 +54,13 @@ class GetMapData(BaseHandler):
 				}))
 				return
 
-			self.train_fc = self.get_train(self.classes)
-			# todo set this up with memcache
-			
-			area = self.region.area().getInfo() / 1e6
+			# once per request, the handlers reuse it rather than going over the ring again
+			self.area = remap.region_area(self.data['region'])
+			area = self.area
+			if area is None:
+				# degenerate, self intersecting or large ring, let earth engine sort it out
+				area = self.region.area().getInfo()
+			area /= 1e6
 			if area > config.AREA_THRESHOLD:
 				logging.error('region size exceeded size, requested size: %.3f.' % area)
 				self.response.set_status(500)
@@ -71,15 +84,36 @@ class GetMapData(BaseHandler):
 	def too_many_points(self, classes):
 		return sum([ len( label['points'] ) for label in classes ]) > config.MAX_POINTS
 
-	def get_train(self, classes):
-		for label in classes:
-			label['fc'] = ee.FeatureCollection([
-				ee.Feature(
-					ee.Geometry.Point([p['lng'],p['lat']]),
-				).set('label', label['lab'])
-				for p in label['points']
-			])
-		return ee.FeatureCollection([ lab['fc'] for lab in classes]).flatten()
+	@webapp2.cached_property
+	def train_fc(self):
+		""" The training set, built on first use so a cached classification doesn't sample the points.
+		"""
+		return self.get_training()
+
+	def get_training(self):
+		""" Returns the training set with the predictor values under every point.
+			Samples are cached by the composite pixel the point falls in, so only points
+			in pixels that haven't been seen before are sampled from earth engine.
+		"""
+		grid = remap.composite_grid(self.past)
+		snapped = iter(remap.snap_points([ (p['lng'], p['lat']) for label in self.classes for p in label['points'] ], grid))
+		cells = [ [ next(snapped) for p in label['points'] ] for label in self.classes ]
+		keys = dict( (cell, self.sample_key(cell, grid)) for label_cells in cells for cell in label_cells )
+		found = cache_get_multi(list(set(keys.values())))
+		missing = [ cell for cell in keys if keys[cell] not in found ]
+		if missing:
+			sampled = dict( (keys[cell], values) for cell, values in zip(missing, remap.sample_points(missing, self.past, self.sampling)) )
+			cache_set_multi(sampled, SAMPLE_TTL)
+			found.update(sampled)
+		return remap.training_fc([
+			(label['lab'], found[keys[cell]])
+			for label, label_cells in zip(self.classes, cells)
+			for cell in label_cells
+		], self.predictors)
+
+	def sample_key(self, cell, grid):
+		bands = [ p['short_name'] for p in remap.predictors ]
+		return cache_key('sample', bool(self.past), self.sampling, grid, cell, bands, remap.parameters['reduce_to_vector_scale'])
 
 	def get_region(self, data):
 		region_path = data['region']
@@ -91,6 +125,14 @@ class GetMapData(BaseHandler):
 	def post(self):
 		""" Receives the training data and returns a classified raster.
 		"""
+		self.log_query()
+		layers = cache_get(self.classification_key())
+		if layers is None:
+			classified = remap.get_classified_from_fc(self.train_fc, self.predictors, self.past).clip(self.region)
+			layers = self.classified_layers(classified)
+		self.response.write(json.dumps(layers))
+
+	def log_query(self):
 		# log points
 		datastore(self.request.remote_addr, 
 			self.request.headers.get('User-Agent'),
@@ -98,11 +140,24 @@ class GetMapData(BaseHandler):
 			len(self.classes),
 			False,
 			json.dumps(self.data['region']))
-		
-		classified = remap.get_classified_from_fc(self.train_fc, self.predictors, self.past).clip(self.region)
 
+	def classified_layers(self, classified):
+		""" Returns the map layers of the classified image and caches them by classification_key.
+		"""
 		self.add_layer(classified, self.get_vis(self.classes), "Classified Map")
-		self.response.write(json.dumps(self.layers))
+		cache_set(self.classification_key(), self.layers, MAP_TOKEN_TTL)
+		return self.layers
+
+	def classification_key(self):
+		""" A canonical hash of everything that determines the classified map.
+		"""
+		classes = [{
+				'lab': label['lab'],
+				'colour': label['colour'],
+				'points': [ [p['lng'], p['lat']] for p in label['points'] ]
+			} for label in self.classes ]
+		region = [ [x['lng'], x['lat']] for x in self.data['region'] ]
+		return cache_key('classified', classes, self.predictors, self.past, self.sampling, region, remap.parameters)
 
 	def get_vis(self, classes):
 		return {
@@ -115,13 +170,10 @@ class GetMapData(BaseHandler):
 
 class GetPerformance(GetMapData):
 	def post(self):
-		cm = remap.get_perf_from_fc(self.train_fc, self.predictors)
-		resp = {
-			#'cm': cm.getInfo(),
-			'accuracy':cm.accuracy().getInfo(),
-			'consumers_accuracy':cm.consumersAccuracy().getInfo(),
-			'producers_accuracy':cm.producersAccuracy().getInfo()
-		}
+		cm = remap.get_perf_from_fc(self.train_fc, self.predictors, self.past)
+		# fetch the matrix once and work the metrics out here rather than
+		# evaluating the whole training graph for each of them
+		resp = remap.confusion_metrics(cm.getInfo())
 		return self.response.write(json.dumps(resp))
 
 class GetPredictorLayer(GetMapData):
@@ -130,6 +182,7 @@ class GetPredictorLayer(GetMapData):
 		# vis parameters for ls8 and ls7
 		nvis = {'bands': 'Red, Green, Blue', 'min':0, 'max': 128}
 		nvis_past = {'bands': 'Red, Green, Blue', 'min':10, 'max': "110,106,120", 'gamma': 0.8}
+		stats = None
 		if chosen in remap.predictor_dict:
 			# set the default colour ramp
 			if 'ramp' in remap.predictor_dict[chosen]:
@@ -137,36 +190,64 @@ class GetPredictorLayer(GetMapData):
 			else:
 				ramp = config.DEFAULT_COLOUR_RAMP
 
-			img = remap.base_predictor_layer().select([chosen])
+			img = remap.predictor_band(chosen)
 
 			name =  remap.predictor_dict[chosen]['long_name']
-			if 'mean' not in self.data:
-				sigma = self.data['sigma']
-				vis, mean, total_sd = self.get_vis(self.region, sigma, chosen, img)
-				vis['palette'] = ramp
+			sigma = self.data['sigma']
+			mean = None
+			if 'mean' in self.data:
+				mean, total_sd = self.data['mean'], self.data['total_sd']
+			else:
+				stats_key = cache_key('stats', chosen, [ [x['lng'], x['lat']] for x in self.data['region'] ])
+				cached = cache_get(stats_key)
+				if cached is not None:
+					mean, total_sd = cached['mean'], cached['stdDev']
+
+			if mean is None:
+				# the stretch is worked out on the server as part of the map, so the
+				# map id doesn't have to wait for the stats to come back
+				plain = img
+				stats = self.get_stats(self.region, chosen, img)
+				mean, total_sd = ee.Number(stats.get('mean')), ee.Number(stats.get('stdDev'))
+				img = img.visualize(
+					min=mean.subtract(total_sd.multiply(sigma)),
+					max=mean.add(total_sd.multiply(sigma)),
+					palette=[ c.strip() for c in ramp.split(',') ])
+				stats = stats.getInfoAsync()
+				vis = {}
 			else:
-				mean = self.data['mean']
-				sigma = self.data['sigma']
-				total_sd = self.data['total_sd']
-				vis = {
-					'min': mean - sigma * total_sd,
-					'max': mean + sigma * total_sd,
-					'palette': ramp
-				}
+				vis = self.stretch(mean, total_sd, sigma, ramp)
 		elif chosen == 'natural':
 			name = "Natural"
-			img = remap.base_predictor_layer().select(['Red', 'Green', 'Blue'])
+			img = remap.base_predictor_layer(bands=['Red', 'Green', 'Blue'])
 			vis = nvis
 			mean, total_sd = 0, 1 # default values for mean and total sd
 		elif chosen == 'past-natural':
 			name = "Natural 99-03"
-			img = remap.base_predictor_layer(True).select(['Red', 'Green', 'Blue'])
+			img = remap.base_predictor_layer(True, ['Red', 'Green', 'Blue'])
 			vis = nvis_past
 			mean, total_sd = 0, 1 # default values for mean and total sd
 		else:
 			return self.response.write(json.dumps({'message': 'Predictor not found'}))
 		
-		m = img.getMapId(vis)
+		if stats is None:
+			# without the stats the layer is the same for everyone
+			m = cached_map_id(cache_key('mapid', chosen, vis), img, vis)
+		else:
+			try:
+				m = img.getMapId(vis)
+				stats = stats.result()
+				mean, total_sd = stats['mean'], stats['stdDev']
+				if mean is None:
+					raise ee.EEException('No samples of %s in the region.' % chosen)
+				cache_set(stats_key, stats, SAMPLE_TTL)
+			except ee.EEException as e:
+				# fall back to the predictor's global stretch
+				logging.warning('failed to get the stats of %s: %s' % (chosen, e))
+				stats.cancel()
+				mean, total_sd = remap.stretch_stats(chosen)
+				vis = self.stretch(mean, total_sd, sigma, ramp)
+				m = cached_map_id(cache_key('mapid', chosen, vis), plain, vis)
 		response = {
 			'label':name,
 			'mapid': m['mapid'],
@@ -176,23 +257,35 @@ class GetPredictorLayer(GetMapData):
 		}
 		return self.response.write(json.dumps(response))
 
-	def get_vis(self, region, sigma, chosen, img):
-		# get the bounds
+	def stretch(self, mean, total_sd, sigma, ramp):
+		return {
+			'min': mean - sigma * total_sd,
+			'max': mean + sigma * total_sd,
+			'palette': ramp
+		}
+
+	def get_stats(self, region, chosen, img):
+		""" Returns an ee.Dictionary with the mean and (population) stdDev of the predictor in the region.
+		"""
 		points = ee.FeatureCollection.randomPoints(region, remap.parameters['pred_vis_points'])
 		vals = img.rename([chosen]).clip(region).sampleRegions(points, scale=1)
-		stats = vals.aggregate_stats(chosen).getInfo()['values']
-		return {
-			'min': stats['mean'] - sigma * stats['total_sd'],
-			'max': stats['mean'] + sigma * stats['total_sd'],
-		}, stats['mean'], stats['total_sd']
+		return vals.reduceColumns(
+			ee.Reducer.mean().combine(ee.Reducer.stdDev(), sharedInputs=True),
+			[chosen])
 
 class Assessment(GetMapData):
 	def post(self):
+		if self.data.get('assessment') == 'all':
+			classified = remap.get_classified_from_fc(self.train_fc, self.predictors, self.past).clip(self.region)
+			results = remap.assessment_all(classified, self.region, self.data['region'],
+				len(self.classes), self.data.get('aoo_cells', False))
+			return self.response.write(json.dumps(results))
+
 		selected = int(self.data['selected'])
 		label = selected + 1
-		interest = remap.get_classified_from_fc(self.train_fc, self.predictors).clip(self.region)
+		interest = remap.get_classified_from_fc(self.train_fc, self.predictors, self.past).clip(self.region)
 		interest = ee.Image(0).where(interest.eq(label), 1).clip(self.region)
-		results = remap.assessment(interest, self.region)
+		results = remap.assessment(interest, self.region, self.data['region'], self.data.get('aoo_cells', False))
 
 		results['selected'] = selected
 
@@ -200,16 +293,57 @@ class Assessment(GetMapData):
 
 class GetHistData(GetMapData):
 	def post(self):
-		train_fc = self.get_train(self.classes)
-		classified = remap.get_classified_from_fc(self.train_fc, self.predictors).clip(self.region)
+		classified = remap.get_classified_from_fc(self.train_fc, self.predictors, self.past).clip(self.region)
+
+		scales = remap.parameters['histogram_scales']
+		scale = self.data.get('scale', scales[0])
+		if scale not in scales:
+			self.response.set_status(500)
+			return self.response.write(json.dumps({
+				"message": "Unknown histogram scale %s, use one of %s." % (scale, scales)
+			}))
+		tiles = remap.region_tiles(self.data['region'])
+		if len(tiles) > 1:
+			# large regions are reduced a tile at a time
+			hist_data = remap.reduce_tiles(lambda tile: self.hist_data(classified, scale, tile),
+				remap.tile_geometries(self.region, tiles))
+			hist_data = {'groups': remap.merge_groups([ h['groups'] for h in hist_data ], 'class')}
+		else:
+			hist_data = self.hist_data(classified, scale).getInfo()
+		self.response.write(json.dumps(remap.hist_results(hist_data, scale)))
 
-		# TODO AREA ESTIMATES
-		hist_data = classified.addBands(ee.Image.pixelArea()).reduceRegion(
+	def hist_data(self, classified, scale, geometry = None):
+		return classified.addBands(ee.Image.pixelArea()).reduceRegion(
 			reducer=ee.Reducer.sum().unweighted().forEachBand(classified).group(
 				groupField=0,
 				groupName="class"),
-			geometry=self.region, 
+			geometry=geometry or self.region, 
 			# enable , if getting errors about maximum number of pixels
-			scale=remap.parameters['histogram_scale'],
-			maxPixels=5000000000).getInfo()
-		self.response.write(json.dumps(hist_data))
\ No newline at end of file
+			scale=scale,
+			maxPixels=5000000000)
+
+class GetResults(GetHistData):
+	""" Builds the classifier once and returns the classified map layers, the performance
+		metrics and the coarse area histogram together. The assessment is only run when asked
+		for, by /getassessment.
+	"""
+	def post(self):
+		self.log_query()
+		composite, classifier = remap.get_classifier_from_fc(self.train_fc, self.predictors, self.past)
+		classified = composite.classify(classifier).clip(self.region)
+
+		layers = cache_get(self.classification_key())
+		# the map id is a request of its own, it is fetched alongside the values
+		pending = ee.futures.submit(self.classified_layers, classified) if layers is None else None
+		values = ee.data.getValues({
+			'cm': classifier.confusionMatrix(),
+			# a quick coarse histogram, the front end refines it when the chart is opened
+			'histogram': self.hist_data(classified, remap.parameters['histogram_scales'][0])
+		})
+		if pending is not None:
+			layers = pending.result()
+		self.response.write(json.dumps({
+			'layers': layers,
+			'performance': remap.confusion_metrics(values['cm']),
+			'histogram': remap.hist_results(values['histogram'], remap.parameters['histogram_scales'][0])
+		}))
@@ -2,5 +2,9 @@
 from predictors import *
 from predictor_image import *
 from parameters import *
+from sampling import *
 from classification import *
-from assessment import *
\ No newline at end of file
+from assessment import *
+from area import *
+from tiling import *
+from export import *
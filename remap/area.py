@@ -0,0 +1,99 @@
+"""
+	Client side geometry helpers, these work on the raw region path sent by the front end
+	([{'lat': .., 'lng': ..}, ...]) so simple checks don't need a round trip to earth engine.
+"""
+import math
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# radius of the sphere with the same surface area as the WGS84 ellipsoid
+AUTHALIC_RADIUS = 6371007.181 # meters
+AREA_MAX_VERTICES = 20000 # larger rings are left to earth engine, checking them here would be slower
+
+def path_coords(path):
+	""" Returns the region path as an open ring of (lng, lat) tuples.
+	"""
+	coords = [ (float(x['lng']), float(x['lat'])) for x in path ]
+	if len(coords) > 1 and coords[0] == coords[-1]:
+		coords = coords[:-1]
+	return coords
+
+def path_bounds(path):
+	""" Returns (xmin, ymin, xmax, ymax) of the region path in degrees.
+	"""
+	coords = path_coords(path)
+	x = [ c[0] for c in coords ]
+	y = [ c[1] for c in coords ]
+	return min(x), min(y), max(x), max(y)
+
+def region_area(path):
+	""" Returns the geodesic area of the region path in meters squared, or None if the ring
+		is degenerate, self intersecting or too large and the area should be computed by earth engine.
+	"""
+	coords = path_coords(path)
+	if len(coords) > AREA_MAX_VERTICES or len(set(coords)) < 3 or self_intersecting(coords):
+		return None
+	area = spherical_area(coords)
+	if area <= 0:
+		return None
+	return area
+
+def spherical_area(coords):
+	""" Area of a ring of (lng, lat) vertices joined by great circles, on the authalic sphere.
+		Sums the signed area of the triangles each edge makes with the south pole.
+	"""
+	if numpy is not None:
+		lng = numpy.radians(numpy.array([ c[0] for c in coords ], dtype=float))
+		lat = numpy.radians(numpy.array([ c[1] for c in coords ], dtype=float))
+		tans = numpy.tan((math.pi / 2 + lat) / 2)
+		dlng = numpy.roll(lng, -1) - lng
+		# take the short way round for edges crossing the antimeridian
+		dlng = (dlng + math.pi) % (2 * math.pi) - math.pi
+		t = tans * numpy.roll(tans, -1)
+		total = numpy.sum(2 * numpy.arctan2(t * numpy.sin(dlng), 1 + t * numpy.cos(dlng)))
+	else:
+		total = 0.0
+		n = len(coords)
+		for i in range(n):
+			lng1, lat1 = map(math.radians, coords[i])
+			lng2, lat2 = map(math.radians, coords[(i + 1) % n])
+			dlng = (lng2 - lng1 + math.pi) % (2 * math.pi) - math.pi
+			t = math.tan((math.pi / 2 + lat1) / 2) * math.tan((math.pi / 2 + lat2) / 2)
+			total += 2 * math.atan2(t * math.sin(dlng), 1 + t * math.cos(dlng))
+	return abs(total) * AUTHALIC_RADIUS ** 2
+
+def self_intersecting(coords):
+	""" Checks whether any two non adjacent edges of the ring cross, in lng/lat space.
+		The edges are swept from west to east, so only edges whose boxes overlap are compared.
+	"""
+	n = len(coords)
+	edges = []
+	for i in range(n):
+		p, q = coords[i], coords[(i + 1) % n]
+		edges.append((min(p[0], q[0]), max(p[0], q[0]), min(p[1], q[1]), max(p[1], q[1]), i, p, q))
+	edges.sort()
+	active = []
+	for xmin, xmax, ymin, ymax, i, p, q in edges:
+		active = [ e for e in active if e[1] >= xmin ]
+		for e in active:
+			j = e[4]
+			if abs(i - j) == 1 or abs(i - j) == n - 1:
+				continue # these share a vertex
+			if e[2] <= ymax and ymin <= e[3] and segments_intersect(p, q, e[5], e[6]):
+				return True
+		active.append((xmin, xmax, ymin, ymax, i, p, q))
+	return False
+
+def segments_intersect(p1, p2, p3, p4):
+	orient = lambda a, b, c : (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+	d1, d2 = orient(p3, p4, p1), orient(p3, p4, p2)
+	d3, d4 = orient(p1, p2, p3), orient(p1, p2, p4)
+	if ((d1 > 0) != (d2 > 0)) and ((d3 > 0) != (d4 > 0)) and 0 not in (d1, d2, d3, d4):
+		return True
+	on_segment = lambda a, b, c : min(a[0], b[0]) <= c[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= c[1] <= max(a[1], b[1])
+	return ((d1 == 0 and on_segment(p3, p4, p1)) or
+			(d2 == 0 and on_segment(p3, p4, p2)) or
+			(d3 == 0 and on_segment(p1, p2, p3)) or
+			(d4 == 0 and on_segment(p1, p2, p4)))
@@ -1,6 +1,8 @@
 import ee
 from parameters import *
 from predictor_image import *
+from area import *
+from tiling import *
 import math, logging
 
 ASSESSMENT_REDUCE_SCALE = 1e2
@@ -8,50 +10,216 @@ ASSESSMENT_UNIT = "km Squared"
 ASSESSMENT_SCALE = 1e6 # ee returns meters by default so we want 
 ASSESSMENT_MAX_ERROR = 1
 ASSESSMENT_AOO_BUFFER = 10000 # old 
-ASSESSMENT_BEST_EFFORT = True
+AOO_CELL_SIZE = 10 # km
+# the EOO hull is found at each of these scales in turn, coarse to fine, only looking near
+# the previous hull, the last scale is the resolution of the result
+EOO_SCALES = [1000, 300, ASSESSMENT_REDUCE_SCALE]
+EOO_CRS = 'EPSG:4326'
 
-def assessment(interest, region):
+def assessment(interest, region, path, cells = False):
 	""" itnerest is a clipped image where the ecosystem of interest is 1 else 0
-			region is the region enclosing the ecosystem.
+			region is the region enclosing the ecosystem and path the region path it was built from.
+			cells adds the area in each occupied AOO grid cell, see aoo_values.
 	"""
 	results = {}
 
-	results['eoo'] = eoo(interest, region)
-	results['aoo'], results['aoo_1pc'], results['grids'], results['area'] = aoo_area(interest, region)
+	# the two are independent, so run them side by side
+	pending = [
+		ee.futures.submit(eoo, interest, region),
+		ee.futures.submit(aoo_area, interest, region, path, cells)
+	]
+	eoo_values, aoo = ee.futures.gather(pending)
+	results.update(eoo_results(eoo_values))
+	results.update(aoo)
 	results['units'] = ASSESSMENT_UNIT
 
 	return results
 
+def assessment_results(values):
+	""" Builds the assessment results of one class from its evaluated eoo and aoo values.
+	"""
+	results = {}
+
+	results.update(eoo_results(values['eoo']))
+	results.update(values['aoo'])
+	results['units'] = ASSESSMENT_UNIT
+
+	return results
+
+def assessment_all(classified, region, path, classes, cells = False):
+	""" The evaluated assessment of every class, see assessment_all_results. Large regions have
+		their class and cell areas reduced a tile at a time and merged here.
+	"""
+	groups = None
+	tiles = region_tiles(path)
+	if len(tiles) > 1:
+		reduced = reduce_tiles(lambda tile: class_cell_groups(classified, region, path, tile), tile_geometries(region, tiles))
+		groups = merge_groups([ r['groups'] for r in reduced ], ['class', 'cell'])
+	values = assessment_all_values(classified, region, path, classes, cells, groups)
+	return assessment_all_results(values.getInfo(), classes)
+
+def assessment_all_values(classified, region, path, classes, cells = False, groups = None):
+	""" The assessment of every class of the classified image at once, as an ee.Dictionary
+		keyed by the class label, 1 to classes, of {'eoo', 'aoo'} dictionaries for assessment_results.
+		The AOO cells of all the classes come from one reduction grouped by class then cell,
+		or from groups, the evaluated and merged 'groups' of class_cell_groups if given.
+	"""
+	x0, y0, dx, dy, ncols, nrows = grid_params(path)
+	if groups is None:
+		groups = class_cell_groups(classified, region, path).get('groups')
+	by_class = ee.FeatureCollection(ee.List(groups).map(lambda g: ee.Feature(None, g)))
+
+	values = {}
+	for label in range(1, classes + 1):
+		cell_groups = ee.List(by_class.filter(ee.Filter.eq('class', label)).aggregate_array('groups')).flatten()
+		values[str(label)] = {
+			'eoo': eoo_value(classified.eq(label), region),
+			'aoo': aoo_metrics(cell_groups, ncols * nrows, cells)
+		}
+	return ee.Dictionary(values)
+
+def class_cell_groups(classified, region, path, geometry = None):
+	""" Returns an ee.Dictionary with the area of each class in every AOO grid cell within the
+		region, or the part of it in geometry, as 'groups' of {'class', 'groups': [{'cell', 'sum'}]}.
+	"""
+	x0, y0, dx, dy, ncols, nrows = grid_params(path)
+	return ee.Image.pixelArea().addBands(
+	  grid_cells(x0, y0, dx, dy, ncols)
+	).addBands(
+	  classified.rename(['class'])
+	).reduceRegion(
+	  reducer=ee.Reducer.sum().group(groupField=1, groupName='cell').group(groupField=2, groupName='class'),
+	  geometry=geometry or region,
+	  scale=100,
+	  maxPixels=5000000000
+	)
+
+def assessment_all_results(values, classes):
+	""" Builds the results of every class from an evaluated assessment_all_values dictionary,
+		as a list in the order of the class labels.
+	"""
+	return {
+		'classes': [ assessment_results(values[str(label)]) for label in range(1, classes + 1) ],
+		'units': ASSESSMENT_UNIT
+	}
+
 # Takes a feature collection of your class and returns its Extent of Occurance in meters squared.
 def eoo(interest, region):
-	class_poly = interest.updateMask(1).reduceToVectors(
-		scale=ASSESSMENT_REDUCE_SCALE, 
-		geometryType='polygon',
-		bestEffort=ASSESSMENT_BEST_EFFORT # best effort might make this less not accurate
-	)
-	return class_poly.geometry().convexHull(
-		maxError=ASSESSMENT_MAX_ERROR
-	).area().getInfo() / ASSESSMENT_SCALE
+	return eoo_value(interest, region).getInfo()
+
+def eoo_results(values):
+	""" The EOO and its error bound from an evaluated eoo_value dictionary, in ASSESSMENT_UNIT.
+	"""
+	return {
+		'eoo': values['area'] / ASSESSMENT_SCALE,
+		'eoo_error': values['error'] / ASSESSMENT_SCALE
+	}
+
+def eoo_value(interest, region):
+	""" Returns an ee.Dictionary with the area of the convex hull of the ecosystem as 'area' and
+		the bound on its error as 'error', in meters squared. The hull of the ecosystem at the last
+		of EOO_SCALES has an area between area - error and area.
+
+		At each scale the cells holding any of the ecosystem are vectorised, so the hull can only
+		be too big. Each cell on the hull holds some of the ecosystem, so the true hull contains the
+		hull shrunk by a cell diagonal. Only the band between the two can hold the vertices of the
+		true hull, so the next scale only vectorises that band.
+	"""
+	# mask out the zeros, otherwise the rest of the region is vectorised as well
+	mask = interest.updateMask(interest).reproject(EOO_CRS, None, EOO_SCALES[-1])
+	search = region
+	for i, scale in enumerate(EOO_SCALES):
+		cells = mask
+		if scale != EOO_SCALES[-1]:
+			cells = mask.reduceResolution(ee.Reducer.max(), maxPixels=65535)
+		hull = cells.reduceToVectors(
+			geometry=search,
+			crs=EOO_CRS,
+			scale=scale,
+			geometryType='polygon',
+			maxPixels=1e13
+		).geometry().convexHull(maxError=ASSESSMENT_MAX_ERROR)
+		diagonal = scale * math.sqrt(2)
+		inner = hull.buffer(-diagonal, ASSESSMENT_MAX_ERROR)
+		if i + 1 < len(EOO_SCALES):
+			# pad the band by a cell of the next scale so the cells straddling its edges are kept
+			margin = EOO_SCALES[i + 1]
+			search = hull.buffer(margin, ASSESSMENT_MAX_ERROR).difference(
+				hull.buffer(-(diagonal + margin), ASSESSMENT_MAX_ERROR), ASSESSMENT_MAX_ERROR)
+
+	area = hull.area(ASSESSMENT_MAX_ERROR)
+	return ee.Dictionary({
+		'area': area,
+		'error': area.subtract(inner.area(ASSESSMENT_MAX_ERROR))
+	})
 
 # takes a feature collection of the class and overlays a 10km sq grid on top of it then returns
-def aoo_area(interest, region):
+def aoo_area(interest, region, path, cells = False):
+	tiles = region_tiles(path)
+	if len(tiles) == 1:
+		return aoo_values(interest, region, path, cells).getInfo()
+	# large regions are reduced a tile at a time, the cell ids are the same in every tile
+	grids = reduce_tiles(lambda tile: aoo_grid(interest, region, path, tile), tile_geometries(region, tiles))
+	groups = merge_groups([ grid['groups'] for grid in grids ], 'cell')
+	return aoo_summary(groups, grids[0]['cells'], cells)
+
+def aoo_values(interest, region, path, cells = False):
+	""" Returns an ee.Dictionary of the AOO metrics of the ecosystem, see aoo_metrics.
+	"""
+	grid = aoo_grid(interest, region, path)
+	return aoo_metrics(grid.get('groups'), grid.get('cells'), cells)
 
-	grid = generate_grid(region)
+def aoo_metrics(groups, grids, cells = False):
+	""" Returns an ee.Dictionary of the AOO metrics from a list of {'cell', 'sum'} grid groups,
+		the number of occupied grid cells as 'aoo', of cells more than 1% occupied as 'aoo_1pc',
+		of cells covering the region (given as grids) as 'grids' and the area of the ecosystem as 'area'.
+		If cells is true it also has a [cell id, area] pair for each occupied cell as 'cells'.
+	"""
+	groups = ee.List(groups)
+	occupied = ee.FeatureCollection(groups.map(lambda g: ee.Feature(None, g))).filter(ee.Filter.gt('sum', 0))
 
-	contains = interest.unmask(0).multiply(
-	  ee.Image.pixelArea()
-	).reduceRegions(
-	  reducer=ee.Reducer.sum(),
-	  collection=grid,
-	  scale=100
-	)
+	values = ee.Dictionary({
+		'aoo': occupied.size(),
+		'aoo_1pc': occupied.filter(ee.Filter.gt('sum', 1e6)).size(), # squares with more than 1e6
+		'grids': grids,
+		'area': occupied.aggregate_sum('sum').divide(ASSESSMENT_SCALE)
+	})
+	if cells:
+		values = values.set('cells', occupied.toList(occupied.size()).map(
+			lambda f: [ ee.Feature(f).get('cell'), ee.Feature(f).get('sum') ]))
+	return values
+
+def aoo_summary(groups, grids, cells = False):
+	""" The metrics of aoo_metrics worked out from evaluated {'cell', 'sum'} grid groups.
+	"""
+	occupied = [ g for g in groups if g['sum'] > 0 ]
+	values = {
+		'aoo': len(occupied),
+		'aoo_1pc': len([ g for g in occupied if g['sum'] > 1e6 ]), # squares with more than 1e6
+		'grids': grids,
+		'area': sum([ g['sum'] for g in occupied ]) / ASSESSMENT_SCALE
+	}
+	if cells:
+		values['cells'] = [ [ g['cell'], g['sum'] ] for g in occupied ]
+	return values
 
-	areas = [ n['properties']['sum'] for n in contains.getInfo()['features'] ]
+def aoo_grid(interest, region, path, geometry = None):
+	""" Returns an ee.Dictionary with the area of the ecosystem in every AOO grid cell within
+		the region, or the part of it in geometry, as 'groups' of {'cell', 'sum'}, and the number
+		of cells covering the region as 'cells'.
+	"""
+	x0, y0, dx, dy, ncols, nrows = grid_params(path)
 
-	total_area = sum(areas)
-	aoo = sum([a > 0 for a in areas])
-	aoo_1pc = sum([a > 1e6 for a in areas]) # squares with more than 1e6
-	return aoo, aoo_1pc, len(areas), total_area / ASSESSMENT_SCALE
+	return interest.unmask(0).multiply(
+	  ee.Image.pixelArea()
+	).addBands(
+	  grid_cells(x0, y0, dx, dy, ncols)
+	).reduceRegion(
+	  reducer=ee.Reducer.sum().group(groupField=1, groupName='cell'),
+	  geometry=geometry or region,
+	  scale=100,
+	  maxPixels=5000000000
+	).set('cells', ncols * nrows)
 
 	""" old method"""
 	# raster method
@@ -67,47 +235,31 @@ def aoo_area(interest, region):
 def class_area(class_poly):
 	return class_poly.geometry().area(maxError=ASSESSMENT_MAX_ERROR).getInfo()
 
-def generate_grid(region):
-	bounds = region.bounds().getInfo()['coordinates'][0]
-
-	x = [ _[0] for _ in bounds ]
-	y = [ _[1] for _ in bounds ]
-
-	xmin, xmax = min(x), max(x)
-	ymin, ymax = min(y), max(y)
+def grid_params(path):
+	""" Lays the AOO grid over the bounds of the region path, with a cell of padding all round.
+		Returns the lng/lat of the corner of the grid, the cell size in degrees and the number of columns and rows.
+	"""
+	xmin, ymin, xmax, ymax = path_bounds(path)
 
 	a = 6378137 # radius of earth in meters
 	lat_per_km = 1.0/110.574 # the error in lat per change of lat is very small so we fix it to a constant for every latitude
 
-	dy = 10 * lat_per_km
+	dy = AOO_CELL_SIZE * lat_per_km
 
 	rads = lambda x : math.pi * x / 180.0
 	dlong = lambda x :  math.pi * a * math.cos(rads(x)) / (180.0 * 1e3) 
 	long_per_km = 2 / (dlong(ymin) + dlong(ymax)) # average km_per_long in region
-	dx = 10 * long_per_km
-
-	xlength = abs(xmax - xmin)
-	ylength = abs(ymax - ymin)
-
-	xsteps = math.ceil(xlength / dx)
-	ysteps = math.ceil(ylength / dy)
+	dx = AOO_CELL_SIZE * long_per_km
 
-	xs = [ xmin + i * dx for i in range( -1 , int(xsteps) + 2)]
-	ys = [ ymin + i * dx for i in range( -1 , int(ysteps) + 2)]
+	xsteps = int(math.ceil(abs(xmax - xmin) / dx))
+	ysteps = int(math.ceil(abs(ymax - ymin) / dy))
 
-	grids_indicies = [[
-		[i, j],
-		[i, j + 1],
-		[i + 1, j + 1],
-		[i + 1, j],
-		[i, j]]
-	for i in range(-1, int(xsteps) + 1)
-	for j in range(-1, int(ysteps) + 1) ]
+	return xmin - dx, ymin - dy, dx, dy, xsteps + 2, ysteps + 2
 
-	coords = [
-		[
-			[xs[c[0]], ys[c[1]]]
-			for c in g ]
-		for g in grids_indicies ]
-
-	return ee.FeatureCollection([ ee.Feature(ee.Geometry.Polygon(g)) for g in coords ])
+def grid_cells(x0, y0, dx, dy, ncols):
+	""" An image of the id of the grid cell each pixel falls in, numbered row by row from (x0, y0).
+	"""
+	lnglat = ee.Image.pixelLonLat()
+	col = lnglat.select('longitude').subtract(x0).divide(dx).floor()
+	row = lnglat.select('latitude').subtract(y0).divide(dy).floor()
+	return row.multiply(ncols).add(col).int().rename(['cell'])
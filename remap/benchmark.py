@@ -0,0 +1,58 @@
+"""
+	Compares the sampling modes on the Gulf of Carpentaria training set.
+	Times building the training set with each mode and checks they sample the same values.
+
+	Needs the config.py holding the earth engine account:
+		python remap/benchmark.py [repeats]
+"""
+import csv, os, sys, time
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ ROOT, os.path.join(ROOT, 'lib') ]
+import config, ee
+from sampling import *
+
+TRAINING_SET = os.path.join(ROOT, 'static', 'data', 'remap_carpentaria_training_set.csv')
+
+def load_cells(path = TRAINING_SET):
+	""" Returns the distinct composite pixels of the training points in the csv.
+	"""
+	with open(path) as f:
+		points = [ (float(row['lng']), float(row['lat'])) for row in csv.DictReader(f) ]
+	return sorted(set(snap_points(points, composite_grid())))
+
+def time_mode(cells, mode, repeats):
+	""" Returns the fastest time taken to sample the cells with the mode, and the samples.
+		Every repeat changes the request slightly so earth engine can't answer from its own cache.
+	"""
+	best = None
+	n = len(cells)
+	for i in range(repeats):
+		start = time.time()
+		values = sample_points(cells[i:] + cells[:i], mode = mode)
+		elapsed = time.time() - start
+		best = elapsed if best is None else min(best, elapsed)
+		values = values[n - i:] + values[:n - i] # back in the order of cells
+	return best, values
+
+def main(repeats = 3):
+	ee.Initialize(ee.ServiceAccountCredentials(config.EE_ACCOUNT, config.EE_PRIVATE_KEY_FILE))
+	cells = load_cells()
+	print('%d training cells, best of %d' % (len(cells), repeats))
+	results = {}
+	for mode in SAMPLING_MODES:
+		elapsed, values = time_mode(cells, mode, repeats)
+		results[mode] = values
+		print('%-8s %8.2f s' % (mode, elapsed))
+
+	reference = results[SAMPLING_MODES[0]]
+	for mode in SAMPLING_MODES[1:]:
+		for p in predictors:
+			band = p['short_name']
+			differing = [ i for i in range(len(cells)) if results[mode][i][band] != reference[i][band] ]
+			status = 'identical' if not differing else '%d differ, e.g. %s: %s vs %s' % (
+				len(differing), cell_centre(cells[differing[0]], composite_grid()),
+				reference[differing[0]][band], results[mode][differing[0]][band])
+			print('%-8s %-25s %s' % (mode, band, status))
+
+if __name__ == '__main__':
+	main(*[ int(a) for a in sys.argv[1:] ])
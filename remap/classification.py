@@ -1,4 +1,4 @@
-import ee
+import ee, math
 
 from parameters import *
 from predictor_image import *
@@ -11,23 +11,54 @@ def get_classifier(training, bands):
 	)
 	return classifier.train(training, "label", bands)
 
+def get_classifier_from_fc(train_fc, predictors, past = False):
+	""" Trains the classifier on the sampled training set, see training_fc.
+		Returns the predictor composite and the trained classifier so the same
+		classifier can be used for the map and its performance metrics.
+	"""
+	composite = predictor_image(past, predictors)
+	return composite, get_classifier(train_fc, predictors)
+
 def get_classified_from_fc(train_fc, predictors, past = False):
-	composite = predictor_image(past).select(predictors)
-	training = composite.reduceRegions(
-		train_fc,
-		reducer = ee.Reducer.first(),
-		scale = parameters['reduce_to_vector_scale']
-	)
-	classifier = get_classifier(training, composite.bandNames())
-	composite = predictor_image(past).select(predictors)
+	composite, classifier = get_classifier_from_fc(train_fc, predictors, past)
 	return composite.classify(classifier)
 
-def get_perf_from_fc(train_fc, predictors):
-	composite = predictor_image().select(predictors)
-	training = composite.reduceRegions(
-		train_fc,
-		reducer = ee.Reducer.first(),
-		scale = parameters['reduce_to_vector_scale']
-	)
-	classifier = get_classifier(training, composite.bandNames())
+def get_perf_from_fc(train_fc, predictors, past = False):
+	composite, classifier = get_classifier_from_fc(train_fc, predictors, past)
 	return classifier.confusionMatrix()
+
+def confusion_metrics(matrix):
+	""" Derives the accuracy metrics from an evaluated confusion matrix, rows are the
+		actual classes and columns the predicted classes. The consumers and producers
+		accuracies have the same shapes as the earth engine arrays, a single row and a
+		single column. Classes without any points get an accuracy of 0.
+	"""
+	n = len(matrix)
+	total = float(sum(sum(row) for row in matrix))
+	correct = [ matrix[i][i] for i in range(n) ]
+	actual = [ sum(row) for row in matrix ]
+	predicted = [ sum(row[i] for row in matrix) for i in range(n) ]
+	ratio = lambda a, b : a / float(b) if b else 0
+
+	accuracy = ratio(sum(correct), total)
+	expected = ratio(sum(a * p for a, p in zip(actual, predicted)), total ** 2)
+	return {
+		'accuracy': accuracy,
+		'kappa': ratio(accuracy - expected, 1 - expected),
+		'consumers_accuracy': [[ ratio(c, p) for c, p in zip(correct, predicted) ]],
+		'producers_accuracy': [ [ratio(c, a)] for c, a in zip(correct, actual) ]
+	}
+
+def hist_results(hist_data, scale):
+	""" Adds the scale of the estimate, the next finer scale to refine it at and the uncertainty
+		of the area of each class. Only the pixels on the edges of a class can be misallocated,
+		about the square root of the pixels in it, so the uncertainty is sqrt(count) * scale^2.
+	"""
+	scales = parameters['histogram_scales']
+	i = scales.index(scale)
+	hist_data['scale'] = scale
+	hist_data['next_scale'] = scales[i + 1] if i + 1 < len(scales) else None
+	for group in hist_data['groups']:
+		count = group['classification'] / scale ** 2
+		group['uncertainty'] = math.sqrt(count) * scale ** 2
+	return hist_data
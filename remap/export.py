@@ -0,0 +1,210 @@
+"""
+	Lays out exports and estimates their cost. The region is split into tiles on one shared pixel
+	grid, so tiles exported as separate tasks line up exactly and a VRT index can put them back
+	together. The time an export takes is estimated from the logs of past exports.
+"""
+import math
+from xml.sax.saxutils import escape
+from parameters import *
+from predictors import *
+from area import *
+from tiling import *
+
+EXPORT_CRS = 'EPSG:4326'
+METERS_PER_DEGREE = 2 * math.pi * AUTHALIC_RADIUS / 360 # along the equator, sizes the grid cells
+EXPORT_MAX_TILES = 16 # export tasks started for one export at most
+EXPORT_MODES = ('download', 'single', 'tiled')
+EXPORT_MIN_LOGS = 5 # logged exports needed to calibrate the estimates of a mode on its own
+
+# Kangaroo Island CSV points with the default predictors, exported in one task,
+# these calibrate the estimates until enough exports have been logged
+DEFAULT_PREDICTORS = len([ p for p in predictors if p.get('checked') ])
+KANGAROO_ISLAND_AREA = 4405e6 # meters squared
+DEFAULT_EXPORT_LOGS = [
+	{'mode': 'single', 'pixels': KANGAROO_ISLAND_AREA / 30 ** 2, 'predictors': DEFAULT_PREDICTORS, 'tiles': 1, 'seconds': 1335.49},
+	{'mode': 'single', 'pixels': KANGAROO_ISLAND_AREA / 100 ** 2, 'predictors': DEFAULT_PREDICTORS, 'tiles': 1, 'seconds': 177.38},
+]
+
+def export_grid(path, scale):
+	""" The pixel grid of an export of the region path at scale meters in EXPORT_CRS, as
+		{'res', 'x0', 'y0', 'width', 'height'}. (x0, y0) is the top left corner, on a multiple of
+		the pixel size so the same region and scale always give the same grid.
+	"""
+	res = float(scale) / METERS_PER_DEGREE
+	xmin, ymin, xmax, ymax = path_bounds(path)
+	x0 = math.floor(xmin / res) * res
+	y0 = math.ceil(ymax / res) * res
+	return {
+		'res': res,
+		'x0': x0,
+		'y0': y0,
+		'width': int(math.ceil((xmax - x0) / res)),
+		'height': int(math.ceil((y0 - ymin) / res))
+	}
+
+def export_tiles(path, grid, area, max_area = None):
+	""" Splits the export grid along the region_tiles boxes of the region path, into pixel windows
+		{'col', 'row', 'width', 'height'}. area is the region_area of the path, max_area is raised
+		so there are at most EXPORT_MAX_TILES.
+		The windows are rounded out to whole pixels, so neighbours can share a column or row of
+		pixels but never leave a gap between them.
+	"""
+	if max_area is None:
+		max_area = parameters['export_tile_area']
+	if area is not None:
+		# a little over, so rounding can't split the tiles once more
+		max_area = max(max_area, 1.01 * area / 1e6 / EXPORT_MAX_TILES)
+	boxes = region_tiles(path, max_area)
+	while len(boxes) > EXPORT_MAX_TILES:
+		# the halves of a split differ a little in area, so a few tiles can still go over it
+		max_area *= 1.1
+		boxes = region_tiles(path, max_area)
+	res, x0, y0 = grid['res'], grid['x0'], grid['y0']
+	tiles = []
+	for xmin, ymin, xmax, ymax in boxes:
+		col = max(int(math.floor((xmin - x0) / res)), 0)
+		row = max(int(math.floor((y0 - ymax) / res)), 0)
+		col_end = min(int(math.ceil((xmax - x0) / res)), grid['width'])
+		row_end = min(int(math.ceil((y0 - ymin) / res)), grid['height'])
+		if col_end > col and row_end > row:
+			tiles.append({'col': col, 'row': row, 'width': col_end - col, 'height': row_end - row})
+	return tiles
+
+def export_bytes(grid):
+	""" The uncompressed size of an export on the grid, the classes are exported as one Byte band.
+	"""
+	return grid['width'] * grid['height']
+
+def export_pixels(path, scale, area):
+	""" The number of pixels of the region path at scale meters, the pixels that are classified.
+		area is the region_area of the path.
+	"""
+	if area is None:
+		# degenerate or self intersecting, go by the grid instead
+		grid = export_grid(path, scale)
+		return grid['width'] * grid['height']
+	return int(area / scale ** 2)
+
+def export_mode(grid, area, tiled = None, download = True):
+	""" How a region of area meters squared is exported on the grid, one of EXPORT_MODES. Small
+		exports are downloaded, unless download is False. Larger ones are tiled if the region is
+		larger than the export tile area, or as tiled says if it isn't None.
+	"""
+	if download and export_bytes(grid) <= parameters['download_max_bytes']:
+		return 'download'
+	if tiled is None:
+		tiled = area is not None and area / 1e6 > parameters['export_tile_area']
+	return 'tiled' if tiled else 'single'
+
+def export_work(pixels, predictors, tiles):
+	""" The work of an export for the slowest of its tasks, the tiles of an export run side by side.
+	"""
+	return float(pixels) * predictors / tiles
+
+def calibrate_exports(logs):
+	""" Fits seconds = overhead + cost * export_work to the logs of past exports, as
+		{mode: (overhead, cost)}. The logs are dicts with the mode, pixels, predictors, tiles and
+		seconds of each export. Modes with too few logs use the fit of all the logs, or the
+		default logs if there are too few of those too.
+	"""
+	fit_all = _fit(logs) if len(logs) >= EXPORT_MIN_LOGS else None
+	fits = {}
+	for mode in EXPORT_MODES:
+		mode_logs = [ log for log in logs if log['mode'] == mode ]
+		fit = _fit(mode_logs) if len(mode_logs) >= EXPORT_MIN_LOGS else None
+		fits[mode] = fit or fit_all or _fit(DEFAULT_EXPORT_LOGS)
+	return fits
+
+def _fit(logs):
+	""" Least squares overhead and cost, or None if the logs don't show a cost.
+	"""
+	x = [ export_work(log['pixels'], log['predictors'], log['tiles']) for log in logs ]
+	y = [ log['seconds'] for log in logs ]
+	n = float(len(x))
+	mx, my = sum(x) / n, sum(y) / n
+	sxx = sum((xi - mx) ** 2 for xi in x)
+	if sxx == 0:
+		return None
+	cost = sum((xi - mx) * (yi - my) for xi, yi in zip(x, y)) / sxx
+	if cost <= 0:
+		return None
+	overhead = my - cost * mx
+	if overhead < 0:
+		# through the origin instead
+		overhead = 0.0
+		cost = sum(xi * yi for xi, yi in zip(x, y)) / sum(xi * xi for xi in x)
+	return overhead, cost
+
+def export_estimate(path, area, scale, predictors, calibration, tiled = None):
+	""" Estimates the export of the region path at scale meters with the predictors, as
+		{'scale', 'mode', 'tiles', 'pixels', 'bytes', 'seconds'}. area is the region_area of the
+		path, bytes is the uncompressed size of the GeoTIFF, calibration is from calibrate_exports.
+	"""
+	grid = export_grid(path, scale)
+	mode = export_mode(grid, area, tiled)
+	tiles = len(export_tiles(path, grid, area)) if mode == 'tiled' else 1
+	pixels = export_pixels(path, scale, area)
+	overhead, cost = calibration[mode]
+	return {
+		'scale': scale,
+		'mode': mode,
+		'tiles': tiles,
+		'pixels': pixels,
+		'bytes': export_bytes(grid),
+		'seconds': overhead + cost * export_work(pixels, len(predictors), tiles)
+	}
+
+def auto_scale(path, area, predictors, budget, calibration, tiled = None):
+	""" The estimate of the export at the finest of the export scales that is expected to take
+		at most budget seconds, or at the coarsest scale if none are. area is the region_area
+		of the path, worked out once for all the scales.
+	"""
+	for scale in sorted(parameters['export_scales']):
+		estimate = export_estimate(path, area, scale, predictors, calibration, tiled)
+		if estimate['seconds'] <= budget:
+			break
+	return estimate
+
+def tile_transform(grid, tile = None):
+	""" The crs_transform of the tile, the shared grid moved to the tile's top left pixel.
+		Without a tile, the transform of the whole grid.
+	"""
+	res = grid['res']
+	if tile is None:
+		tile = {'col': 0, 'row': 0}
+	return [ res, 0, grid['x0'] + tile['col'] * res, 0, -res, grid['y0'] - tile['row'] * res ]
+
+def tile_region(grid, tile):
+	""" The corners of the tile, as the coordinates of an export region.
+	"""
+	res = grid['res']
+	xmin = grid['x0'] + tile['col'] * res
+	ymax = grid['y0'] - tile['row'] * res
+	xmax = xmin + tile['width'] * res
+	ymin = ymax - tile['height'] * res
+	return [ [xmin, ymax], [xmin, ymin], [xmax, ymin], [xmax, ymax] ]
+
+def tile_vrt(grid, tiles, file_names):
+	""" A GDAL VRT index placing each exported tile file at its window of the grid, as one Byte band.
+		Masked pixels are exported as 0, which is the no data value.
+	"""
+	res = grid['res']
+	sources = [
+		'\t\t<SimpleSource>\n'
+		'\t\t\t<SourceFilename relativeToVRT="1">%s</SourceFilename>\n'
+		'\t\t\t<SourceBand>1</SourceBand>\n'
+		'\t\t\t<SrcRect xOff="0" yOff="0" xSize="%d" ySize="%d"/>\n'
+		'\t\t\t<DstRect xOff="%d" yOff="%d" xSize="%d" ySize="%d"/>\n'
+		'\t\t</SimpleSource>\n' % (escape(name), tile['width'], tile['height'],
+			tile['col'], tile['row'], tile['width'], tile['height'])
+		for tile, name in zip(tiles, file_names)
+	]
+	return (
+		'<VRTDataset rasterXSize="%d" rasterYSize="%d">\n' % (grid['width'], grid['height']) +
+		'\t<SRS>%s</SRS>\n' % EXPORT_CRS +
+		'\t<GeoTransform>%r, %r, 0, %r, 0, %r</GeoTransform>\n' % (grid['x0'], res, grid['y0'], -res) +
+		'\t<VRTRasterBand dataType="Byte" band="1">\n'
+		'\t\t<NoDataValue>0</NoDataValue>\n' +
+		''.join(sources) +
+		'\t</VRTRasterBand>\n'
+		'</VRTDataset>\n')
@@ -8,6 +8,7 @@ parameters = {
 	############################################# 
 	# Training set building
 	'reduce_to_vector_scale':1,
+	'sampling_mode': 'scale', # see SAMPLING_MODES in sampling.py
 	'class_image_null': 255,
 	'cfmask_ls8_lte':1,
 	# Classifier specific
@@ -15,6 +16,10 @@ parameters = {
 	'oob_mode':True,
 	'number_of_trees': 100,
 	'min_leaf_pop': 13,
-	'histogram_scale': 30,
+	'histogram_scales': [300, 90, 30], # coarse to fine, the area histogram is refined through them
+	'tile_area': 5000, # km^2, larger regions are reduced in tiles of about this size, see tiling.py
+	'export_tile_area': 500, # km^2, larger regions are exported in tiles of about this size, see export.py
+	'export_scales': [30, 60, 100, 250, 500, 1000], # meters, picked from to fit an export's time budget
+	'download_max_bytes': 10 * 2 ** 20, # smaller exports are downloaded directly instead of going through the batch queue
 	'pred_vis_points': 100
 }
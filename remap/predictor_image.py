@@ -4,23 +4,55 @@
 import ee
 import json
 from parameters import *
+from predictors import *
 
+# the precomputed landsat composites stand in for the LANDSAT/LC8_SR collection
+LANDSAT_IMPORT = 'LANDSAT/LC8_SR'
 
-def predictor_image(past = False):
+# how derived predictors are computed from the image of their inputs
+derivations = {
+	'normalized_difference': lambda img: img.normalizedDifference(),
+	'ratio': lambda img: img.select(0).divide(img.select(1)),
+	'difference': lambda img: img.select(0).subtract(img.select(1)),
+	'slope': lambda img: ee.Terrain.slope(img),
+}
+
+# the predictor bands never change, so each is built and serialised once per
+# instance and spliced into every request graph that uses it
+_predictor_bands = {}
+
+def predictor_image(past = False, bands = None):
 	""" Returns an ee image, that will be used as a predictor.
 		start_date, and end_date currently do nothing, as we are loading a precomputed landsat image.
 		with predictors as bands. missing data is given the value of -20k
 	"""
-	return base_predictor_layer(past).unmask(-20000)
+	return base_predictor_layer(past, bands).unmask(-20000)
 
-def base_predictor_layer(past = False):
-	# 1. BIOCLIM
-	bioclim = ee.Image('WORLDCLIM/V1/BIO').select(
-					['bio01', 					'bio12'], 
-					['Mean Annual Temperature', 'Annual Precipitation'])
-	# 2. Elevation / Slope
-	elevation = ee.Image('USGS/SRTMGL1_003').rename(['Elevation'])
-	slope = ee.Terrain.slope(elevation).rename(['Slope'])
+def base_predictor_layer(past = False, bands = None):
+	""" Returns the given predictor bands, in the given order, without missing data filled in.
+		Only the bands asked for and the ones they are derived from are built, all of them by default.
+	"""
+	if bands is None:
+		bands = [ p['short_name'] for p in predictors ]
+	return ee.Image([ predictor_band(name, past) for name in bands ])
+
+def predictor_band(name, past = False):
+	""" Returns a single predictor band, building it from its metadata in predictors.py.
+	"""
+	key = (name, past)
+	if key not in _predictor_bands:
+		predictor = predictor_dict[name]
+		if 'derivation' in predictor:
+			inputs = ee.Image([ predictor_band(i, past) for i in predictor['inputs'] ])
+			band = derivations[predictor['derivation']](inputs)
+		else:
+			band = source_image(predictor['ee_import'], past).select([predictor.get('band', name)])
+		_predictor_bands[key] = ee.serializer.memoize(band.rename([name]))
+	return _predictor_bands[key]
+
+def source_image(ee_import, past = False):
+	if ee_import != LANDSAT_IMPORT:
+		return ee.Image(ee_import)
 
 	def brightness_img(imgCol, start, end, from_):
 		collection = ee.ImageCollection(imgCol).filterDate(start, end)
@@ -28,31 +60,17 @@ def base_predictor_layer(past = False):
 		collection = collection.select(from_, ["Blue", "Green", "Red", "NIR"]).median()
 		return collection
 		total = collection.reduce(ee.Reducer.sum())
-  		return collection.divide(total)
+		return collection.divide(total)
 
-  	"""
+	"""
 	if past: 
 		ls = brightness_img("LANDSAT/LE7_SR", "1999-01-01", "2003-01-01",["B1", "B2", "B3", "B4"])
 	else:
 		ls = brightness_img("LANDSAT/LC8_SR", "2014", "2017",["B2", "B3", "B4", "B5"])
 	"""
-	# 3. Landsat 8
+	# Landsat 8
 	if not past:
-		ls = ee.Image('users/JohnHWilshire/ls_8_cflte1_2k14to17_at_30m_ui8')
+		return ee.Image('users/JohnHWilshire/ls_8_cflte1_2k14to17_at_30m_ui8')
 	else:
-		ls = ee.Image('users/JohnHWilshire/ls_7_self_masked_99_03_at_30m')
+		return ee.Image('users/JohnHWilshire/ls_7_self_masked_99_03_at_30m')
 		# ls = ee.Image('users/JohnHWilshire/ls_5_cflte1_85to95_at_30m_ui8')
-	
-
-
-	return ee.Image([
-			bioclim,
-			elevation,
-			slope,
-			ls,
-			ls.normalizedDifference(['NIR', 'Red']).rename(['NDVI']),
-			ls.normalizedDifference(['Green', 'NIR']).rename(['NDWI']),
-			ls.select('Blue').divide(ls.select('NIR')).rename(['WBI']),
-			ls.select('Blue').subtract(ls.select('Red')).rename(['BR']),
-			ls.normalizedDifference(['Blue', 'Green']).rename(['BG'])
-		])#.unmask(-20000) # set missing values to -20k
@@ -1,23 +1,34 @@
+# "band" is the name of the band in the ee_import image, it defaults to the short name.
+# "derivation" and "inputs" say how a band is computed from other predictors, see predictor_image.py
+# "stretch" is the low and high value of the predictor to colour it with when the stats of a region can't be had,
+# rough ranges picked by hand. stretches.py prints the 2nd and 98th percentile of each predictor over the land
+# of the world to replace them with, it needs the earth engine account so it hasn't been run over these yet
 predictors = [
     {
         "description": "todo", 
         "long_name": "Normalised Difference Vegetation index", 
         "short_name": "NDVI",
+        "derivation": "normalized_difference",
+        "inputs": ["NIR", "Red"],
         "type": "Index",
         "ee_import": 'LANDSAT/LC8_SR',
         "checked": True,
         "vis": True,
-        "ramp": '000000, 00FF00'
+        "ramp": '000000, 00FF00',
+        "stretch": [-0.2, 0.8]
     }, 
     {
         "description": "todo", 
         "long_name": "Normalised Difference Water index", 
         "short_name": "NDWI",
+        "derivation": "normalized_difference",
+        "inputs": ["Green", "NIR"],
         "type": "Index",
         "ee_import": 'LANDSAT/LC8_SR',
         "checked": True,
         "vis": True,
-        "ramp":'070467, 17ffed'
+        "ramp":'070467, 17ffed',
+        "stretch": [-0.7, 0.3]
 
     },
     {
@@ -26,6 +37,8 @@ predictors = [
         "type": "Index",
         "ee_import": 'LANDSAT/LC8_SR',
         "short_name": "WBI",
+        "derivation": "ratio",
+        "inputs": ["Blue", "NIR"],
         "vis": False
     }, 
     {
@@ -34,12 +47,16 @@ predictors = [
         "type": "Index",
         "ee_import": 'LANDSAT/LC8_SR',
         "short_name": "BR",
+        "derivation": "difference",
+        "inputs": ["Blue", "Red"],
         "vis": False
     }, 
     {
         "description": "todo", 
         "long_name": "Normalised Difference Blue Green", 
         "short_name": "BG",
+        "derivation": "normalized_difference",
+        "inputs": ["Blue", "Green"],
         "type": "Index",
         "ee_import": 'LANDSAT/LC8_SR',
         "checked": True,
@@ -81,26 +98,32 @@ predictors = [
         "checked": True,
         "vis": True,
         "ramp":'000000,ffffff',
+        "stretch": [0, 128],
     },
     {
         "description": "todo", 
         "type": "Elevation",
         "long_name": "SRTM Digital Elevation Data 30m", 
         "short_name": "Elevation",
+        "band": "elevation",
         "ee_import": 'USGS/SRTMGL1_003',
         "checked": True,
         "vis": True,
-        "ramp":"00a0b0,edc951,ed6841,cc2a36,4f372d"
+        "ramp":"00a0b0,edc951,ed6841,cc2a36,4f372d",
+        "stretch": [0, 1500]
     },
     {
         "description": "todo", 
         "type": "Elevation",
         "long_name": "SRTM Slope", 
         "short_name": "Slope",
+        "derivation": "slope",
+        "inputs": ["Elevation"],
         "ee_import": 'USGS/SRTMGL1_003',
         "checked": True,
         "vis": True,
-        "ramp":"edc951,ed6841,cc2a36,4f372d,00a0b0"
+        "ramp":"edc951,ed6841,cc2a36,4f372d,00a0b0",
+        "stretch": [0, 30]
     }, 
     {
         "description": "todo", 
@@ -108,8 +131,10 @@ predictors = [
         "long_name": "Mean Annual Temperature", 
         "ee_import": 'WORLDCLIM/V1/BIO',
         "short_name": "Mean Annual Temperature",
+        "band": "bio01",
         "vis": True,
-        "ramp":"39018a,0090fe,98ff77,ffff0b,fa0100,590000"
+        "ramp":"39018a,0090fe,98ff77,ffff0b,fa0100,590000",
+        "stretch": [0, 300]
     }, 
     {
         "description": "todo", 
@@ -117,8 +142,10 @@ predictors = [
         "type": "BIOCLIM",
         "ee_import": 'WORLDCLIM/V1/BIO',
         "short_name": "Annual Precipitation",
+        "band": "bio12",
         "vis": True,
-        "ramp":'ffffff,c7d6f7,00057a'
+        "ramp":'ffffff,c7d6f7,00057a',
+        "stretch": [0, 3000]
     }
 
 ]
@@ -128,3 +155,9 @@ predictor_dict = {}
 # build a dict for vis lookup later
 for p in predictors:
     predictor_dict[p['short_name']] = p 
+
+def stretch_stats(name):
+    """ The mean and standard deviation that put the predictor's stretch at two standard deviations either side of the mean.
+    """
+    low, high = predictor_dict[name]['stretch']
+    return (low + high) / 2.0, (high - low) / 4.0
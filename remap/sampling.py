@@ -0,0 +1,137 @@
+"""
+	Sampling of the predictor values under the training points. The predictor assets never
+	change, so the samples can be cached by location and reused by later classifications.
+"""
+import ee, math, re
+from parameters import *
+from predictors import *
+from predictor_image import *
+
+# training points are snapped to the pixels of the landsat composite and sampled at the
+# pixel centre, so a cached sample is exactly the value of the pixel that was clicked
+GRID_MAX_ERROR = 0.01 # meters, for moving the points into the grid's projection
+
+# 'scale' samples at parameters['reduce_to_vector_scale'], 'native' samples on the
+# 30 m grid of the landsat composite instead of reprojecting every predictor to 1 m
+SAMPLING_MODES = ('scale', 'native')
+
+# the projection of each composite, it never changes so it is fetched once per instance
+_composite_grids = {}
+
+def composite_grid(past = False):
+	""" Returns the pixel grid of the landsat composite as {'crs', 'transform'}, the crs is a code
+		or WKT and the transform is [xScale, xShearing, xTranslation, yShearing, yScale, yTranslation].
+	"""
+	past = bool(past)
+	if past not in _composite_grids:
+		info = source_image(LANDSAT_IMPORT, past).projection().getInfo()
+		_composite_grids[past] = {'crs': info.get('crs') or info['wkt'], 'transform': info['transform']}
+	return _composite_grids[past]
+
+def snap_points(points, grid):
+	""" Returns the (column, row) of the grid pixel each (lng, lat) point falls in.
+	"""
+	sx, _, tx, _, sy, ty = grid['transform']
+	return [ (int(math.floor((x - tx) / sx)), int(math.floor((y - ty) / sy))) for x, y in project_points(points, grid['crs']) ]
+
+# WGS84, for projecting points to UTM on the client
+WGS84_A = 6378137.0 # meters
+WGS84_F = 1 / 298.257223563
+UTM_K0 = 0.9996
+UTM_FALSE_EASTING = 500000.0 # meters
+UTM_FALSE_NORTHING = 10000000.0 # meters, of the southern zones
+UTM_CODES = re.compile(r'^EPSG:32([67])(\d\d)$')
+
+# the points earth engine moved into other projections, by (crs, lng, lat), kept per instance
+# so the same training points don't need another round trip
+PROJECTED_POINTS_SIZE = 100000 # points kept at most, the cache starts over once it's full
+_projected_points = {}
+
+def project_points(points, crs):
+	""" Returns the [x, y] of each (lng, lat) point in the crs. Lng/lat and UTM are worked out
+		here, other projections are left to earth engine for the points it hasn't moved yet.
+	"""
+	if crs == 'EPSG:4326':
+		return [ list(p) for p in points ]
+	utm = UTM_CODES.match(crs)
+	if utm:
+		south, zone = utm.group(1) == '7', int(utm.group(2))
+		return [ utm_coords(lng, lat, zone, south) for lng, lat in points ]
+	missing = sorted(set( (crs, p[0], p[1]) for p in points if (crs, p[0], p[1]) not in _projected_points ))
+	if missing:
+		coords = ee.Geometry.MultiPoint([ [lng, lat] for _, lng, lat in missing ]).transform(
+			ee.Projection(crs), GRID_MAX_ERROR).coordinates().getInfo()
+		if len(_projected_points) + len(missing) > PROJECTED_POINTS_SIZE:
+			_projected_points.clear()
+		_projected_points.update(zip(missing, coords))
+	return [ _projected_points[(crs, p[0], p[1])] for p in points ]
+
+def utm_coords(lng, lat, zone, south = False):
+	""" Returns the [easting, northing] of a point in a UTM zone of WGS84, with the Kruger
+		series of the transverse mercator to the 4th order of the flattening, well under a millimeter.
+	"""
+	n = WGS84_F / (2 - WGS84_F)
+	a = WGS84_A / (1 + n) * (1 + n ** 2 / 4 + n ** 4 / 64)
+	alpha = [
+		n / 2 - 2 * n ** 2 / 3 + 5 * n ** 3 / 16 + 41 * n ** 4 / 180,
+		13 * n ** 2 / 48 - 3 * n ** 3 / 5 + 557 * n ** 4 / 1440,
+		61 * n ** 3 / 240 - 103 * n ** 4 / 140,
+		49561 * n ** 4 / 161280
+	]
+	phi = math.radians(lat)
+	lam = math.radians(lng - (zone * 6 - 183))
+	e = 2 * math.sqrt(n) / (1 + n)
+	t = math.sinh(math.atanh(math.sin(phi)) - e * math.atanh(e * math.sin(phi)))
+	xi = math.atan2(t, math.cos(lam))
+	eta = math.atanh(math.sin(lam) / math.sqrt(1 + t ** 2))
+	x, y = eta, xi
+	for j, aj in enumerate(alpha, 1):
+		x += aj * math.cos(2 * j * xi) * math.sinh(2 * j * eta)
+		y += aj * math.sin(2 * j * xi) * math.cosh(2 * j * eta)
+	return [ UTM_FALSE_EASTING + UTM_K0 * a * x, (UTM_FALSE_NORTHING if south else 0) + UTM_K0 * a * y ]
+
+def cell_centre(cell, grid):
+	""" Returns the [x, y] of the centre of a grid pixel, in the grid's projection.
+	"""
+	sx, _, tx, _, sy, ty = grid['transform']
+	return [ tx + (cell[0] + 0.5) * sx, ty + (cell[1] + 0.5) * sy ]
+
+def sample_points(cells, past = False, mode = 'scale'):
+	""" Samples every predictor at the centres of the given pixels of composite_grid(past) in a
+		single request. Returns a list with a dictionary of predictor values for each pixel, in the same order.
+	"""
+	bands = [ p['short_name'] for p in predictors ]
+	grid = composite_grid(past)
+	points = ee.FeatureCollection([
+		ee.Feature(ee.Geometry.Point(cell_centre(cell, grid), grid['crs']), {'i': i})
+		for i, cell in enumerate(cells)
+	])
+	image = predictor_image(past, bands)
+	if mode == 'native':
+		samples = image.sampleRegions(
+			points,
+			properties = ['i'],
+			projection = source_image(LANDSAT_IMPORT, past).projection()
+		)
+	else:
+		samples = image.reduceRegions(
+			points,
+			reducer = ee.Reducer.first(),
+			scale = parameters['reduce_to_vector_scale']
+		)
+	rows = samples.reduceColumns(ee.Reducer.toList(len(bands) + 1), ['i'] + bands).get('list').getInfo()
+	values = [ None ] * len(cells)
+	for row in rows:
+		values[int(row[0])] = dict(zip(bands, row[1:]))
+	return values
+
+def training_fc(samples, predictors):
+	""" Builds the training set from (label, predictor values) pairs, keeping only the chosen predictors.
+		The features have no geometry, the classifier only needs their properties.
+	"""
+	features = []
+	for label, values in samples:
+		properties = dict([ (p, values[p]) for p in predictors ])
+		properties['label'] = label
+		features.append(ee.Feature(None, properties))
+	return ee.FeatureCollection(features)
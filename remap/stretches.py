@@ -0,0 +1,53 @@
+"""
+	Computes the stretch of each visualised predictor, to replace the hand picked values in predictors.py.
+	The stretch is the 2nd and 98th percentile of the predictor over the land of the world,
+	taken at a coarse scale so the reduction fits in one request.
+
+	Needs the config.py holding the earth engine account:
+		python remap/stretches.py
+"""
+import os, sys
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ ROOT, os.path.join(ROOT, 'lib') ]
+import config, ee
+from predictor_image import *
+
+STRETCH_PERCENTILES = [2, 98]
+STRETCH_SCALE = 10000 # meters
+STRETCH_REGION = [-180, -60, 180, 84] # the land, Antarctica aside
+STRETCH_DIGITS = 2 # significant figures kept of each value
+
+def land_mask():
+	""" Water is left out, it would pull the stretch of most predictors towards its own values.
+	"""
+	return ee.Image('MODIS/MOD44W/MOD44W_005_2000_02_24').select('water_mask').Not()
+
+def stretch_values(name):
+	""" Returns the low and high percentiles of the predictor.
+	"""
+	band = predictor_band(name).updateMask(land_mask())
+	stats = band.reduceRegion(
+	  reducer=ee.Reducer.percentile(STRETCH_PERCENTILES),
+	  geometry=ee.Geometry.Rectangle(STRETCH_REGION, None, False),
+	  scale=STRETCH_SCALE,
+	  bestEffort=True,
+	  maxPixels=1e9
+	).getInfo()
+	return [ stats['%s_p%d' % (name, p)] for p in STRETCH_PERCENTILES ]
+
+def rounded(value):
+	""" The value to STRETCH_DIGITS significant figures, as written in predictors.py.
+	"""
+	if value == 0:
+		return 0
+	return float('%.*g' % (STRETCH_DIGITS, value))
+
+def main():
+	ee.Initialize(ee.ServiceAccountCredentials(config.EE_ACCOUNT, config.EE_PRIVATE_KEY_FILE))
+	for p in predictors:
+		if p.get('vis'):
+			low, high = stretch_values(p['short_name'])
+			print('%-25s "stretch": [%r, %r]' % (p['short_name'], rounded(low), rounded(high)))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Test for the client side region areas in remap.area.
+
+	Run from the repository root with PYTHONPATH=.:lib python remap/tests/area_test.py
+"""
+import math
+import unittest
+
+import remap
+from helpers import path
+
+
+def box_area(xmin, ymin, xmax, ymax):
+	""" The area of a box between two meridians and two parallels on the authalic sphere.
+	"""
+	return (remap.AUTHALIC_RADIUS ** 2 * math.radians(xmax - xmin) *
+			(math.sin(math.radians(ymax)) - math.sin(math.radians(ymin))))
+
+
+class AreaTestCase(unittest.TestCase):
+
+	def testKnownSquare(self):
+		"""Verifies the area of a square degree, its top edge bulges a little off the parallel."""
+		area = remap.region_area(path([(0, 0), (1, 0), (1, 1), (0, 1)]))
+		self.assertAlmostEqual(1, area / box_area(0, 0, 1, 1), places=4)
+		self.assertAlmostEqual(12364, area / 1e6, places=0)
+
+	def testOctant(self):
+		"""Verifies a triangle of great circles between the equator and the pole, an eighth of the sphere."""
+		area = remap.region_area(path([(0, 0), (90, 0), (0, 90)]))
+		self.assertAlmostEqual(1, area / (math.pi * remap.AUTHALIC_RADIUS ** 2 / 2), places=9)
+
+	def testClosedRing(self):
+		"""Verifies a ring repeating its first vertex has the same area."""
+		square = [(10, -20), (11, -20), (11, -19), (10, -19)]
+		self.assertEquals(remap.region_area(path(square)), remap.region_area(path(square + square[:1])))
+
+	def testClockwise(self):
+		"""Verifies the area doesn't depend on the winding of the ring."""
+		square = [(140, -30), (141, -30), (141, -29), (140, -29)]
+		self.assertAlmostEqual(1,
+			remap.region_area(path(square[::-1])) / remap.region_area(path(square)), places=12)
+
+	def testAntimeridian(self):
+		"""Verifies a square across the antimeridian has the area of the same square elsewhere."""
+		across = remap.region_area(path([(179.5, -17), (-179.5, -17), (-179.5, -16), (179.5, -16)]))
+		square = remap.region_area(path([(-0.5, -17), (0.5, -17), (0.5, -16), (-0.5, -16)]))
+		self.assertAlmostEqual(1, across / square, places=9)
+
+	def testDegenerate(self):
+		"""Verifies rings without an area are left to earth engine."""
+		self.assertIsNone(remap.region_area(path([(0, 0), (1, 1), (0, 0)])))
+
+	def testSelfIntersecting(self):
+		"""Verifies a bow tie is left to earth engine."""
+		self.assertIsNone(remap.region_area(path([(0, 0), (1, 1), (1, 0), (0, 1)])))
+
+	def testManyVertices(self):
+		"""Verifies a long wavy edge is checked without comparing every pair of edges, and a crossing on it is still found."""
+		wave = [ (136 + 2.0 * i / 5000, -35 + 0.05 * math.sin(i / 3.0)) for i in range(5000) ]
+		ring = wave + [(138, -36), (136, -36)]
+		self.assertFalse(remap.self_intersecting(ring))
+		# the ring now turns back north across the middle of the wave
+		self.assertTrue(remap.self_intersecting(wave + [(138, -36), (137, -35.5), (136.5, -34)]))
+
+	def testTooManyVertices(self):
+		"""Verifies rings over AREA_MAX_VERTICES are left to earth engine."""
+		ring = [ (math.cos(a), math.sin(a)) for a in [ 2 * math.pi * i / (remap.AREA_MAX_VERTICES + 1) for i in range(remap.AREA_MAX_VERTICES + 1) ] ]
+		self.assertIsNone(remap.region_area(path(ring)))
+
+	def testBounds(self):
+		self.assertEquals((-1.0, 2.0, 3.0, 4.5),
+			remap.path_bounds(path([(-1, 2), (3, 2), (3, 4.5), (-1, 2)])))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""Test for laying the AOO grid over a region in remap.assessment.
+
+	Run from the repository root with PYTHONPATH=.:lib python remap/tests/assessment_test.py
+"""
+import math
+import unittest
+
+import remap
+from helpers import path
+
+
+# about 2 by 1 degrees near Kangaroo Island
+RECTANGLE = [(136.5, -36.0), (138.5, -36.0), (138.5, -35.0), (136.5, -35.0)]
+
+
+class GridParamsTestCase(unittest.TestCase):
+
+	def testCellHeight(self):
+		"""Verifies a cell is AOO_CELL_SIZE km high, at 110.574 km per degree of latitude."""
+		x0, y0, dx, dy, cols, rows = remap.grid_params(path(RECTANGLE))
+		self.assertAlmostEqual(remap.AOO_CELL_SIZE / 110.574, dy)
+
+	def testCellWidth(self):
+		"""Verifies a cell is about AOO_CELL_SIZE km wide in the middle of the region."""
+		x0, y0, dx, dy, cols, rows = remap.grid_params(path(RECTANGLE))
+		km_per_degree = math.pi * 6378137 * math.cos(math.radians(35.5)) / 180e3
+		self.assertAlmostEqual(1, dx * km_per_degree / remap.AOO_CELL_SIZE, places=3)
+
+	def testRows(self):
+		"""Verifies the rows cover the region with one row of padding on each side and no more."""
+		x0, y0, dx, dy, cols, rows = remap.grid_params(path(RECTANGLE))
+		self.assertAlmostEqual(-36.0 - dy, y0)
+		self.assertEquals(int(math.ceil(1.0 / dy)) + 2, rows)
+		self.assertGreaterEqual(y0 + rows * dy, -35.0 + dy)
+		self.assertLess(y0 + (rows - 1) * dy, -35.0 + dy)
+
+	def testColumns(self):
+		"""Verifies the columns cover the region with one column of padding on each side and no more."""
+		x0, y0, dx, dy, cols, rows = remap.grid_params(path(RECTANGLE))
+		self.assertAlmostEqual(136.5 - dx, x0)
+		self.assertGreaterEqual(x0 + cols * dx, 138.5 + dx)
+		self.assertLess(x0 + (cols - 1) * dx, 138.5 + dx)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""Test for the accuracy metrics and area histogram results in remap.classification.
+
+	Run from the repository root with PYTHONPATH=.:lib python remap/tests/classification_test.py
+"""
+import unittest
+
+import remap
+
+
+class ConfusionMetricsTestCase(unittest.TestCase):
+
+	def testKappa(self):
+		"""Verifies the metrics of a matrix worked out by hand.
+
+		20 points, 15 correct. 12 and 8 actual, 13 and 7 predicted, so the
+		chance agreement is (12 * 13 + 8 * 7) / 20^2 = 0.53.
+		"""
+		metrics = remap.confusion_metrics([[10, 2], [3, 5]])
+		self.assertAlmostEqual(0.75, metrics['accuracy'])
+		self.assertAlmostEqual((0.75 - 0.53) / (1 - 0.53), metrics['kappa'])
+		self.assertAlmostEqual(10 / 13.0, metrics['consumers_accuracy'][0][0])
+		self.assertAlmostEqual(5 / 7.0, metrics['consumers_accuracy'][0][1])
+		self.assertAlmostEqual(10 / 12.0, metrics['producers_accuracy'][0][0])
+		self.assertAlmostEqual(5 / 8.0, metrics['producers_accuracy'][1][0])
+
+	def testShapes(self):
+		"""Verifies the accuracies are shaped like the earth engine arrays."""
+		metrics = remap.confusion_metrics([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+		self.assertEquals([[1, 1, 1]], metrics['consumers_accuracy'])
+		self.assertEquals([[1], [1], [1]], metrics['producers_accuracy'])
+		self.assertEquals(1, metrics['accuracy'])
+		self.assertEquals(1, metrics['kappa'])
+
+	def testEmptyClass(self):
+		"""Verifies a class without points gets 0 and leaves the other metrics alone."""
+		metrics = remap.confusion_metrics([[10, 2, 0], [3, 5, 0], [0, 0, 0]])
+		expected = remap.confusion_metrics([[10, 2], [3, 5]])
+		self.assertAlmostEqual(expected['accuracy'], metrics['accuracy'])
+		self.assertAlmostEqual(expected['kappa'], metrics['kappa'])
+		self.assertEquals(0, metrics['consumers_accuracy'][0][2])
+		self.assertEquals([0], metrics['producers_accuracy'][2])
+
+	def testPredictedOnly(self):
+		"""Verifies a class that is predicted but never actual has a consumers accuracy of 0."""
+		metrics = remap.confusion_metrics([[4, 1], [0, 0]])
+		self.assertEquals(0, metrics['consumers_accuracy'][0][1])
+		self.assertEquals([0], metrics['producers_accuracy'][1])
+		self.assertAlmostEqual(0.8, metrics['accuracy'])
+		# all the points are actually the first class, so there is no agreement beyond chance
+		self.assertAlmostEqual(0, metrics['kappa'])
+
+	def testNoPoints(self):
+		"""Verifies an empty matrix gives zeros rather than dividing by zero."""
+		metrics = remap.confusion_metrics([[0, 0], [0, 0]])
+		self.assertEquals(0, metrics['accuracy'])
+		self.assertEquals(0, metrics['kappa'])
+		self.assertEquals([[0, 0]], metrics['consumers_accuracy'])
+		self.assertEquals([[0], [0]], metrics['producers_accuracy'])
+
+
+class HistResultsTestCase(unittest.TestCase):
+
+	def histogram(self, *areas):
+		return {'groups': [ {'class': i + 1, 'classification': area} for i, area in enumerate(areas) ]}
+
+	def testUncertainty(self):
+		"""Verifies the uncertainty of a class is the area of the square root of its pixel count.
+
+		9e6 m^2 at 300 m is 100 pixels, so 10 pixels of 9e4 m^2 each can be misallocated.
+		"""
+		results = remap.hist_results(self.histogram(9e6, 0.0), 300)
+		self.assertAlmostEqual(9e5, results['groups'][0]['uncertainty'])
+		self.assertEquals(0, results['groups'][1]['uncertainty'])
+
+	def testFinerScaleIsMoreCertain(self):
+		"""Verifies the same area is less uncertain at a finer scale."""
+		coarse, fine = remap.parameters['histogram_scales'][:2]
+		at_coarse = remap.hist_results(self.histogram(1e8), coarse)['groups'][0]['uncertainty']
+		at_fine = remap.hist_results(self.histogram(1e8), fine)['groups'][0]['uncertainty']
+		self.assertAlmostEqual(float(fine) / coarse, at_fine / at_coarse)
+
+	def testNextScale(self):
+		"""Verifies each scale is refined at the next finer one, and the finest isn't refined."""
+		scales = remap.parameters['histogram_scales']
+		for scale, finer in zip(scales, scales[1:]):
+			results = remap.hist_results(self.histogram(1e6), scale)
+			self.assertEquals(scale, results['scale'])
+			self.assertEquals(finer, results['next_scale'])
+		self.assertIsNone(remap.hist_results(self.histogram(1e6), scales[-1])['next_scale'])
+
+	def testUnknownScale(self):
+		self.assertRaises(ValueError, remap.hist_results, self.histogram(1e6), 7)
+
+
+if __name__ == '__main__':
+	unittest.main()
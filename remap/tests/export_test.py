@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""Test for the export layout and estimates in remap.export.
+
+	Run from the repository root with PYTHONPATH=.:lib python remap/tests/export_test.py
+"""
+import unittest
+
+import remap
+from helpers import path
+from remap import export
+
+
+# about 2 by 1 degrees near Kangaroo Island, a triangle so the tiles don't all fill their boxes
+TRIANGLE = [(136.5, -36.0), (138.5, -36.0), (137.5, -35.0)]
+RECTANGLE = [(136.5, -36.0), (138.5, -36.0), (138.5, -35.0), (136.5, -35.0)]
+
+def covered(tiles):
+	""" The (col, row) pixels inside any of the tiles.
+	"""
+	return set(
+		(col, row)
+		for tile in tiles
+		for col in range(tile['col'], tile['col'] + tile['width'])
+		for row in range(tile['row'], tile['row'] + tile['height'])
+	)
+
+
+class ExportTilesTestCase(unittest.TestCase):
+
+	def testGrid(self):
+		"""Verifies the grid covers the region and starts on a whole number of pixels."""
+		grid = remap.export_grid(path(RECTANGLE), 1000)
+		self.assertAlmostEqual(0, grid['x0'] / grid['res'] - round(grid['x0'] / grid['res']))
+		self.assertAlmostEqual(0, grid['y0'] / grid['res'] - round(grid['y0'] / grid['res']))
+		self.assertLessEqual(grid['x0'], 136.5)
+		self.assertGreaterEqual(grid['y0'], -35.0)
+		self.assertGreaterEqual(grid['x0'] + grid['width'] * grid['res'], 138.5)
+		self.assertLessEqual(grid['y0'] - grid['height'] * grid['res'], -36.0)
+
+	def testNoGap(self):
+		"""Verifies the tiles of a rectangle cover every pixel of its grid."""
+		grid = remap.export_grid(path(RECTANGLE), 1000)
+		tiles = remap.export_tiles(path(RECTANGLE), grid, remap.region_area(path(RECTANGLE)), 100)
+		self.assertGreater(len(tiles), 1)
+		self.assertEquals(grid['width'] * grid['height'], len(covered(tiles)))
+
+	def testInsideGrid(self):
+		"""Verifies the tiles stay on the grid."""
+		grid = remap.export_grid(path(TRIANGLE), 500)
+		for tile in remap.export_tiles(path(TRIANGLE), grid, remap.region_area(path(TRIANGLE)), 100):
+			self.assertGreaterEqual(tile['col'], 0)
+			self.assertGreaterEqual(tile['row'], 0)
+			self.assertLessEqual(tile['col'] + tile['width'], grid['width'])
+			self.assertLessEqual(tile['row'] + tile['height'], grid['height'])
+
+	def testNeighboursShareEdges(self):
+		"""Verifies each tile of a rectangle meets a neighbour or the edge of the grid on every side."""
+		grid = remap.export_grid(path(RECTANGLE), 1000)
+		tiles = remap.export_tiles(path(RECTANGLE), grid, remap.region_area(path(RECTANGLE)), 100)
+		pixels = covered(tiles)
+		for tile in tiles:
+			right, bottom = tile['col'] + tile['width'], tile['row'] + tile['height']
+			if right < grid['width']:
+				self.assertIn((right, tile['row']), pixels)
+			if bottom < grid['height']:
+				self.assertIn((tile['col'], bottom), pixels)
+
+	def testMaxTiles(self):
+		"""Verifies a small tile area is raised so there are at most EXPORT_MAX_TILES."""
+		grid = remap.export_grid(path(TRIANGLE), 250)
+		tiles = remap.export_tiles(path(TRIANGLE), grid, remap.region_area(path(TRIANGLE)), 1)
+		self.assertLessEqual(len(tiles), remap.EXPORT_MAX_TILES)
+		self.assertGreater(len(tiles), 1)
+
+	def testTransform(self):
+		"""Verifies a tile's transform is the grid's moved to the tile's top left pixel."""
+		grid = {'res': 0.5, 'x0': 10.0, 'y0': -20.0, 'width': 8, 'height': 6}
+		tile = {'col': 2, 'row': 4, 'width': 3, 'height': 2}
+		self.assertEquals([0.5, 0, 10.0, 0, -0.5, -20.0], remap.tile_transform(grid))
+		self.assertEquals([0.5, 0, 11.0, 0, -0.5, -22.0], remap.tile_transform(grid, tile))
+		self.assertEquals([[11.0, -22.0], [11.0, -23.0], [12.5, -23.0], [12.5, -22.0]], remap.tile_region(grid, tile))
+
+
+def logs(mode, overhead, cost, n = remap.EXPORT_MIN_LOGS):
+	""" n export logs of the mode that took exactly overhead + cost * work seconds.
+	"""
+	return [
+		{'mode': mode, 'pixels': 1e6 * (i + 1), 'predictors': 10, 'tiles': 1,
+			'seconds': overhead + cost * remap.export_work(1e6 * (i + 1), 10, 1)}
+		for i in range(n)
+	]
+
+
+class CalibrateExportsTestCase(unittest.TestCase):
+
+	def assertFit(self, expected, fit):
+		self.assertAlmostEqual(expected[0], fit[0])
+		self.assertAlmostEqual(expected[1] * 1e6, fit[1] * 1e6)
+
+	def testDefaults(self):
+		"""Verifies every mode uses the fit of the default logs without any logs."""
+		default = remap.calibrate_exports(remap.DEFAULT_EXPORT_LOGS)['single']
+		fits = remap.calibrate_exports([])
+		for mode in remap.EXPORT_MODES:
+			self.assertEquals(default, fits[mode])
+		# two logs, so the line goes through both
+		for log in remap.DEFAULT_EXPORT_LOGS:
+			seconds = default[0] + default[1] * remap.export_work(log['pixels'], log['predictors'], log['tiles'])
+			self.assertAlmostEqual(log['seconds'], seconds)
+
+	def testTooFewLogs(self):
+		"""Verifies fewer than EXPORT_MIN_LOGS logs fall back to the default fit."""
+		fits = remap.calibrate_exports(logs('single', 5, 2e-6, remap.EXPORT_MIN_LOGS - 1))
+		self.assertEquals(remap.calibrate_exports([]), fits)
+
+	def testOwnFit(self):
+		"""Verifies a mode with enough logs is fitted on its own, and the others use all the logs."""
+		fits = remap.calibrate_exports(logs('single', 20, 1e-6) + logs('tiled', 60, 3e-6))
+		self.assertFit((20, 1e-6), fits['single'])
+		self.assertFit((60, 3e-6), fits['tiled'])
+		all_logs = export._fit(logs('single', 20, 1e-6) + logs('tiled', 60, 3e-6))
+		self.assertEquals(all_logs, fits['download'])
+
+	def testAllLogs(self):
+		"""Verifies modes with too few logs of their own use the fit of all the logs."""
+		fits = remap.calibrate_exports(logs('single', 20, 1e-6, 3) + logs('tiled', 20, 1e-6, 3))
+		self.assertFit((20, 1e-6), fits['single'])
+		self.assertFit((20, 1e-6), fits['download'])
+
+	def testNoCost(self):
+		"""Verifies logs of the same work don't give a fit, and the defaults are used."""
+		same = [ dict(log, pixels=1e6, seconds=10 + i) for i, log in enumerate(logs('single', 0, 0)) ]
+		self.assertIsNone(export._fit(same))
+		self.assertEquals(remap.calibrate_exports([]), remap.calibrate_exports(same))
+
+	def testThroughOrigin(self):
+		"""Verifies a fit with a negative overhead is taken through the origin instead."""
+		overhead, cost = export._fit(logs('single', -50, 2e-6))
+		self.assertEquals(0, overhead)
+		self.assertGreater(cost, 0)
+
+
+class AutoScaleTestCase(unittest.TestCase):
+
+	def setUp(self):
+		self.predictors = [ p['short_name'] for p in remap.predictors ]
+		self.calibration = dict( (mode, (30.0, 1e-6)) for mode in remap.EXPORT_MODES )
+		self.area = remap.region_area(path(TRIANGLE))
+
+	def testFinest(self):
+		"""Verifies the finest scale is picked when the budget allows it."""
+		estimate = remap.auto_scale(path(TRIANGLE), self.area, self.predictors, 1e9, self.calibration)
+		self.assertEquals(min(remap.parameters['export_scales']), estimate['scale'])
+
+	def testCoarsest(self):
+		"""Verifies the coarsest scale is picked when no scale fits the budget."""
+		estimate = remap.auto_scale(path(TRIANGLE), self.area, self.predictors, 1, self.calibration)
+		self.assertEquals(max(remap.parameters['export_scales']), estimate['scale'])
+
+	def testBudget(self):
+		"""Verifies the picked scale fits the budget and the next finer one doesn't.
+
+		Untiled, so the estimates only get shorter as the scale gets coarser.
+		"""
+		scales = sorted(remap.parameters['export_scales'])
+		seconds = [ remap.export_estimate(path(TRIANGLE), self.area, s, self.predictors, self.calibration, False)['seconds'] for s in scales ]
+		budget = (seconds[2] + seconds[1]) / 2
+		estimate = remap.auto_scale(path(TRIANGLE), self.area, self.predictors, budget, self.calibration, False)
+		self.assertEquals(scales[2], estimate['scale'])
+		self.assertLessEqual(estimate['seconds'], budget)
+
+
+if __name__ == '__main__':
+	unittest.main()
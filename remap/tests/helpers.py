@@ -0,0 +1,7 @@
+"""Shared helpers for the remap tests."""
+
+
+def path(coords):
+	""" The region path the front end sends, [{'lng', 'lat'}, ...], of (lng, lat) coords.
+	"""
+	return [ {'lng': lng, 'lat': lat} for lng, lat in coords ]
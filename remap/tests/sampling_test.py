@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""Test for snapping training points to the composite grid in remap.sampling.
+
+	Run from the repository root with PYTHONPATH=.:lib python remap/tests/sampling_test.py
+"""
+import unittest
+
+import remap
+from remap import sampling
+
+
+class SnapPointsTestCase(unittest.TestCase):
+
+	def testUtm(self):
+		"""Verifies a point north of the equator against GeographicLib, 33.3N 44.4E is 38N 444140.54 3684706.36."""
+		easting, northing = remap.utm_coords(44.4, 33.3, 38)
+		self.assertAlmostEqual(444140.54, easting, places=2)
+		self.assertAlmostEqual(3684706.36, northing, places=2)
+
+	def testCentralMeridian(self):
+		"""Verifies a point on the central meridian is at the false easting, and 45N is the meridian arc scaled by k0."""
+		easting, northing = remap.utm_coords(-75, 45, 18)
+		self.assertAlmostEqual(remap.UTM_FALSE_EASTING, easting)
+		self.assertAlmostEqual(remap.UTM_K0 * 4984944.378, northing, places=2)
+
+	def testSouth(self):
+		"""Verifies the southern zones are the northern ones moved by the false northing."""
+		north = remap.utm_coords(137.5, -35.0, 53)
+		south = remap.utm_coords(137.5, -35.0, 53, True)
+		self.assertAlmostEqual(north[0], south[0])
+		self.assertAlmostEqual(remap.UTM_FALSE_NORTHING, south[1] - north[1])
+
+	def testSnapLngLat(self):
+		"""Verifies lng/lat points fall in the pixel below and right of the grid's top left corner."""
+		grid = {'crs': 'EPSG:4326', 'transform': [0.5, 0, 10.0, 0, -0.5, -20.0]}
+		self.assertEquals([(0, 0), (3, 1)], remap.snap_points([(10.1, -20.1), (11.6, -20.9)], grid))
+
+	def testSnapUtm(self):
+		"""Verifies points in a UTM grid are snapped without earth engine."""
+		grid = {'crs': 'EPSG:32638', 'transform': [30, 0, 444000, 0, -30, 3684900]}
+		self.assertEquals([(4, 6)], remap.snap_points([(44.4, 33.3)], grid))
+
+	def testSnapCached(self):
+		"""Verifies points earth engine already moved into a projection are snapped from the cache."""
+		crs = 'EPSG:3577'
+		sampling._projected_points[(crs, 137.5, -35.0)] = [615.0, -45.0]
+		try:
+			grid = {'crs': crs, 'transform': [30, 0, 0, 0, -30, 0]}
+			self.assertEquals([(20, 1)], remap.snap_points([(137.5, -35.0)], grid))
+		finally:
+			sampling._projected_points.clear()
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Test for splitting regions into tiles and merging their results in remap.tiling.
+
+	Run from the repository root with PYTHONPATH=.:lib python remap/tests/tiling_test.py
+"""
+import unittest
+
+import remap
+from helpers import path
+
+
+SQUARE = [(0, 0), (2, 0), (2, 2), (0, 2)]
+# a U open to the north, the gap between its arms is x 1 to 2
+U_SHAPE = [(0, 0), (3, 0), (3, 3), (2, 3), (2, 1), (1, 1), (1, 3), (0, 3)]
+
+
+class MergeTestCase(unittest.TestCase):
+
+	def testMergeGroups(self):
+		"""Verifies groups with the same key are added up and sorted by key."""
+		merged = remap.merge_groups([
+			[{'cell': 5, 'sum': 1.0}, {'cell': 2, 'sum': 2.0}],
+			[{'cell': 2, 'sum': 3.0}, {'cell': 9, 'sum': None}],
+		], 'cell')
+		self.assertEquals([
+			{'cell': 2, 'sum': 5.0},
+			{'cell': 5, 'sum': 1.0},
+			{'cell': 9},
+		], merged)
+
+	def testMergeNestedGroups(self):
+		"""Verifies class then cell groups from two tiles are merged at both levels."""
+		merged = remap.merge_groups([
+			[
+				{'class': 2, 'groups': [{'cell': 7, 'sum': 1.0}]},
+				{'class': 1, 'groups': [{'cell': 3, 'sum': 2.0}, {'cell': 4, 'sum': 1.0}]},
+			],
+			[
+				{'class': 1, 'groups': [{'cell': 4, 'sum': 5.0}, {'cell': 1, 'sum': 1.0}]},
+				{'class': 3, 'groups': [{'cell': 4, 'sum': 2.0}]},
+			],
+		], ['class', 'cell'])
+		self.assertEquals([
+			{'class': 1, 'groups': [{'cell': 1, 'sum': 1.0}, {'cell': 3, 'sum': 2.0}, {'cell': 4, 'sum': 6.0}]},
+			{'class': 2, 'groups': [{'cell': 7, 'sum': 1.0}]},
+			{'class': 3, 'groups': [{'cell': 4, 'sum': 2.0}]},
+		], merged)
+
+	def testMergeNothing(self):
+		self.assertEquals([], remap.merge_groups([[], []], ['class', 'cell']))
+
+
+class ClipTestCase(unittest.TestCase):
+
+	def testInside(self):
+		"""Verifies a box holding the whole ring leaves it as it is."""
+		self.assertEquals(SQUARE, remap.clip_ring(SQUARE, (-1, -1, 3, 3)))
+
+	def testOutside(self):
+		"""Verifies a box away from the ring clips it to nothing."""
+		self.assertEquals([], remap.clip_ring(SQUARE, (5, 5, 6, 6)))
+		self.assertEquals(0, remap.clipped_area(SQUARE, (5, 5, 6, 6)))
+
+	def testTouching(self):
+		"""Verifies a box sharing only an edge with the ring clips it to no area."""
+		self.assertAlmostEqual(0, remap.clipped_area(SQUARE, (2, 0, 3, 2)))
+		self.assertAlmostEqual(0, remap.clipped_area(SQUARE, (0, 2, 2, 3)))
+
+	def testHalf(self):
+		"""Verifies a box over half of the ring clips it to a rectangle."""
+		ring = remap.clip_ring(SQUARE, (1, -1, 3, 3))
+		self.assertEquals(sorted([(1, 0), (2, 0), (2, 2), (1, 2)]), sorted(set(ring)))
+
+	def testConcave(self):
+		"""Verifies clipping across the gap of a U keeps the area of both arms.
+
+		The arms come out joined along the bottom of the box by zero width edges.
+		"""
+		box = (0, 2, 3, 3)
+		arms = remap.region_area(path([(0, 2), (1, 2), (1, 3), (0, 3)])) + remap.region_area(path([(2, 2), (3, 2), (3, 3), (2, 3)]))
+		self.assertAlmostEqual(1, remap.clipped_area(U_SHAPE, box) / arms, places=2)
+
+
+class RegionTilesTestCase(unittest.TestCase):
+
+	def testSmallRegion(self):
+		"""Verifies a region under the tile area is one tile, its bounds."""
+		self.assertEquals([(0.0, 0.0, 2.0, 2.0)], remap.region_tiles(path(SQUARE), 1e6))
+
+	def testSplit(self):
+		"""Verifies the tiles of a large region are under the tile area and add up to the region."""
+		area = remap.region_area(path(SQUARE)) / 1e6
+		tiles = remap.region_tiles(path(SQUARE), area / 5)
+		self.assertGreater(len(tiles), 5)
+		areas = [ remap.clipped_area(SQUARE, box) / 1e6 for box in tiles ]
+		for tile_area in areas:
+			self.assertLessEqual(tile_area, area / 5)
+		self.assertAlmostEqual(1, sum(areas) / area, places=3)
+
+	def testTilesDontOverlap(self):
+		"""Verifies the tiles of a rectangle fit together without overlapping."""
+		tiles = remap.region_tiles(path(SQUARE), 1.01 * remap.region_area(path(SQUARE)) / 1e6 / 4)
+		self.assertEquals(4, len(tiles))
+		box_area = lambda b: (b[2] - b[0]) * (b[3] - b[1])
+		self.assertAlmostEqual(4, sum(box_area(b) for b in tiles))
+
+	def testConcaveSplit(self):
+		"""Verifies the empty parts of a concave region don't become tiles."""
+		area = remap.region_area(path(U_SHAPE)) / 1e6
+		tiles = remap.region_tiles(path(U_SHAPE), area / 8)
+		for box in tiles:
+			self.assertGreater(remap.clipped_area(U_SHAPE, box), 0)
+		total = sum(remap.clipped_area(U_SHAPE, box) for box in tiles) / 1e6
+		self.assertAlmostEqual(1, total / area, places=3)
+
+
+if __name__ == '__main__':
+	unittest.main()
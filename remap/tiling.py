@@ -0,0 +1,138 @@
+"""
+	Splits large regions into tiles that are reduced side by side and merged afterwards, so no
+	single earth engine call has to cover the whole region.
+"""
+import ee, logging, math
+from parameters import *
+from area import *
+
+TILE_WORKERS = 8 # tiles reduced at the same time
+TILE_RETRIES = 2 # extra attempts for a failed tile
+TILE_MAX_DEPTH = 8 # at most 2^8 tiles
+TILE_MAX_ERROR = 1 # meters, for the tile geometries
+
+def region_tiles(path, max_area = None):
+	""" Splits the region path into tiles of at most max_area km^2 of the region each, as
+		(xmin, ymin, xmax, ymax) boxes. Each box is cut in two along its longer side where
+		that halves the area of the region in it, so the tiles hold about the same area.
+		Regions smaller than max_area are a single tile.
+	"""
+	if max_area is None:
+		max_area = parameters['tile_area']
+	coords = path_coords(path)
+	return _split(coords, path_bounds(path), max_area * 1e6, 0)
+
+def _split(coords, box, max_area, depth):
+	area = clipped_area(coords, box)
+	if area == 0:
+		return []
+	if area <= max_area or depth >= TILE_MAX_DEPTH:
+		return [ box ]
+	xmin, ymin, xmax, ymax = box
+	width = (xmax - xmin) * math.cos(math.radians((ymin + ymax) / 2))
+	axis = 0 if width >= ymax - ymin else 1
+	lo, hi = box[axis], box[axis + 2]
+	for _ in range(30):
+		cut = (lo + hi) / 2
+		if clipped_area(coords, _with(box, axis + 2, cut)) < area / 2:
+			lo = cut
+		else:
+			hi = cut
+	cut = (lo + hi) / 2
+	return (_split(coords, _with(box, axis + 2, cut), max_area, depth + 1) +
+			_split(coords, _with(box, axis, cut), max_area, depth + 1))
+
+def _with(box, i, value):
+	box = list(box)
+	box[i] = value
+	return tuple(box)
+
+def clipped_area(coords, box):
+	""" The area in meters squared of the part of the (lng, lat) ring inside the box.
+	"""
+	ring = clip_ring(coords, box)
+	if len(ring) < 3:
+		return 0
+	return spherical_area(ring)
+
+def clip_ring(coords, box):
+	""" Clips the ring to the box one side at a time (Sutherland-Hodgman). A concave ring can come
+		out with zero width joins, which don't change its area.
+	"""
+	xmin, ymin, xmax, ymax = box
+	sides = [
+		(lambda p: p[0] >= xmin, 0, xmin),
+		(lambda p: p[0] <= xmax, 0, xmax),
+		(lambda p: p[1] >= ymin, 1, ymin),
+		(lambda p: p[1] <= ymax, 1, ymax),
+	]
+	ring = list(coords)
+	for inside, axis, value in sides:
+		if not ring:
+			break
+		clipped = []
+		for i, p in enumerate(ring):
+			q = ring[i - 1]
+			if inside(p) != inside(q):
+				t = float(value - q[axis]) / (p[axis] - q[axis])
+				clipped.append((q[0] + t * (p[0] - q[0]), q[1] + t * (p[1] - q[1])))
+			if inside(p):
+				clipped.append(p)
+		ring = clipped
+	return ring
+
+def tile_geometries(region, tiles):
+	""" The parts of the region inside each tile, as ee geometries.
+	"""
+	return [
+		region.intersection(ee.Geometry.Rectangle(list(box)), TILE_MAX_ERROR)
+		for box in tiles
+	]
+
+def reduce_tiles(reduction, geometries, retries = TILE_RETRIES):
+	""" Evaluates reduction(geometry) for every tile geometry, TILE_WORKERS at a time.
+		A failed tile is retried on its own up to retries times before the whole reduction fails.
+		Returns the evaluated results in the order of the geometries.
+	"""
+	executor = ee.futures.Executor(TILE_WORKERS)
+	pending = dict( (i, executor.submit(reduction(g).getInfo)) for i, g in enumerate(geometries) )
+	attempts = dict.fromkeys(pending, 0)
+	results = [ None ] * len(geometries)
+	while pending:
+		for i in sorted(pending):
+			try:
+				results[i] = pending.pop(i).result()
+			except ee.EEException as e:
+				attempts[i] += 1
+				if attempts[i] > retries:
+					for future in pending.values():
+						future.cancel()
+					raise
+				logging.warning('tile %d of %d failed, retrying: %s' % (i + 1, len(geometries), e))
+				pending[i] = executor.submit(reduction(geometries[i]).getInfo)
+	return results
+
+def merge_groups(groups, group_names):
+	""" Merges the evaluated lists of groups of a grouped reducer from each tile, adding up the
+		values of the groups with the same group name value. group_names are the group names from
+		the outer grouping in, nested 'groups' are merged with the rest of the names.
+		The merged groups are sorted by their group name value, like earth engine sorts them.
+	"""
+	if isinstance(group_names, basestring):
+		group_names = [ group_names ]
+	name = group_names[0]
+	merged = {}
+	for tile_groups in groups:
+		for group in tile_groups:
+			target = merged.setdefault(group[name], { name: group[name] })
+			for field, value in group.items():
+				if field == name or value is None:
+					continue
+				elif field == 'groups':
+					target.setdefault('groups', []).append(value)
+				else:
+					target[field] = target.get(field, 0) + value
+	for target in merged.values():
+		if 'groups' in target:
+			target['groups'] = merge_groups(target['groups'], group_names[1:])
+	return [ merged[key] for key in sorted(merged) ]
@@ -91,11 +91,15 @@ app = webapp2.WSGIApplication([
 	('/getperformance', GetPerformance),
 	('/getassessment', Assessment),
 	('/gethistdata', GetHistData),
+	('/getresults', GetResults),
 	('/getpredictorlayer', GetPredictorLayer),
 	('/oauth2callback', OAuth),
 	('/logout', Logout),
 	('/export', Export),
 	('/exportworker', ExportWorker),
+	('/exportpoll', ExportPoll),
+	('/exportstage', ExportStage),
+	('/cachesweep', CacheSweep),
 	## website endpoints
 	('/home', Home),
 	('/tutorial', Tutorial),
@@ -13,20 +13,26 @@ function giveTraining (past_) {
   refreshChart = true
   $('#spinner').show()
   $('#classify').text('Classifying!')
+  histData = null
+  assessmentData = null
   var postData = buildPostData()
-  // fire a post request with our training data to get the map id
   $('.button-collapse').sideNav('hide')
-  $.post('/getmapdata',
+  // the map, the accuracy and the coarse histogram come back together from one classifier,
+  // every class is only assessed once the assessment is asked for
+  $.post('/getresults',
     postData,
-    addClassifiedMap, 'json')
+    function (data) {
+      addClassifiedMap(data.layers)
+      showPerformance(data.performance)
+      histData = data.histogram
+      histData.postData = postData
+      refreshChart = false
+    }, 'json')
     .fail(function (err) { // alert the user that something has gone wrong
       $('#spinner').hide()
       $('#classify').text('Classify!')
-      Materialize.toast(err.responseJSON.message, 10000, 'rounded')
-    })
-    .done(function () {
-      // get the performance data.
-      getPerformance(postData)
+      console.log(err)
+      Materialize.toast(err.responseJSON ? err.responseJSON.message : err.statusText, 10000, 'rounded')
     })
 }
 
@@ -39,18 +45,39 @@ function moreResults() {
         $('<div>').attr('class', 'indeterminate'))))
   // open the results modal
   $('#modal1').modal('open')
-  if(refreshChart)
+  if(refreshChart) {
     getHistData(buildPostData())
+  } else if (histData) {
+    $('#histchart').empty()
+    buildChart(histData)
+    if (histData.next_scale && !histData.refining) {
+      getHistData(histData.postData, histData.next_scale)
+    }
+  }
 }
 
-// get the histogram data and then calls build chart
-function getHistData(postData) {
+// get the histogram data and then calls build chart, the histogram starts at a
+// coarse scale and is refined at each finer scale the server offers
+function getHistData(postData, scale) {
   refreshChart = false
+  var request = JSON.parse(postData)
+  if (scale) {
+    request.scale = scale
+    histData.refining = true
+  }
   $.post('/gethistdata',
-    postData,
+    JSON.stringify(request),
     function (data, error) { // build the chart
+      if (histData && histData.postData !== postData) {
+        return // the training has changed since
+      }
+      data.postData = postData
+      histData = data
       $('#histchart').empty()
       buildChart(data)
+      if (data.next_scale) {
+        getHistData(postData, data.next_scale)
+      }
     }, 'json').fail(function (err) {
       Materialize.toast(err.statusText/* + ': ' + err.responseJSON.message*/, 10000, 'rounded') // responseJSON is undefined
       console.log(err)
@@ -60,13 +87,18 @@ function getHistData(postData) {
 // constructs the chart from data
 function buildChart (data) {
   var fix = function(x) { return Math.round(x/1e4) }
+  // error bars of the uncertainty at the scale of the estimate
+  var low = function(g) { return fix(g.classification - g.uncertainty) }
+  var high = function(g) { return fix(g.classification + g.uncertainty) }
 
-  var chartArray = [['Class', 'Hectares', {role: 'style'}]].concat(
+  var chartArray = [['Class', 'Hectares', {role: 'style'}, {role: 'interval'}, {role: 'interval'}]].concat(
     classList.map(function (x, i) {
       return [ 
         x.name,
         fix(data.groups[i].classification), 
-        'color: ' + x.colour
+        'color: ' + x.colour,
+        low(data.groups[i]),
+        high(data.groups[i])
       ]
     }))
   // dont display NA area if it is less than 2 ha
@@ -77,7 +109,9 @@ function buildChart (data) {
       chartArray.push([
         'Not classified',
         fix(data.groups[classList.length].classification),
-        'color: #fff'
+        'color: #fff',
+        low(data.groups[classList.length]),
+        high(data.groups[classList.length])
       ])
     }
   }
@@ -85,7 +119,7 @@ function buildChart (data) {
   var chartData = new google.visualization.arrayToDataTable(chartArray)
   var chart = new google.visualization.ColumnChart($('#histchart')[0])
   var opts2 = {
-    title: 'Area in Hectares (Estimate)',
+    title: 'Area in Hectares (Estimate at ' + data.scale + ' m' + (data.next_scale ? ', refining' : '') + ')',
     legend: { position: 'none' },
     width: $(window).width() * 0.75,
     height: $(window).height() * 0.8,
@@ -103,26 +137,19 @@ function runAssessment () {
   $('#assessment-loading').removeClass('hidden')
   $('#assessment-results-row').addClass('hidden')
 
-  var training = buildPostData()
+  var key = assessmentKey()
+  if (assessmentData && assessmentData.key === key) {
+    // every class was already assessed with the classification
+    showAssessment(assessmentData.classes[$('#assessment_select').val()])
+    $('#assessment_btn').removeClass('disabled')
+    return
+  }
   $.post('/getassessment',
-    training,
-    function (data){
-      // populate the results
-      // console.log(data)
-      $('#assessment-area').text(
-        'Total Area: ' + data.area.toFixed(3) + ' ' + data.units
-      )
-      $('#assessment-eoo').text(
-        'EOO: ' + data.eoo.toFixed(3) + ' ' + data.units
-      )
-      $('#assessment-aoo').text(
-        'AOO: '+ data.aoo + ' Grids'
-      )
-      $('#assessment-aoo-1pc').text(
-        'AOO 1%: ' + data.aoo_1pc + ' Grids'
-      )
-      $('#assessment-loading').addClass('hidden')
-      $('#assessment-results-row').removeClass('hidden')
+    buildPostData(),
+    function (data) {
+      assessmentData = data
+      assessmentData.key = key
+      showAssessment(data.classes[$('#assessment_select').val()])
     },
     'json'
   ).fail(function(err) {
@@ -136,6 +163,26 @@ function runAssessment () {
     $('#assessment_btn').removeClass('disabled')
   })
 }
+// populates the assessment modal
+function showAssessment (data) {
+  $('#assessment-area').text(
+    'Total Area: ' + data.area.toFixed(3) + ' ' + data.units
+  )
+  // the hull can only be too big, by at most the error
+  $('#assessment-eoo').text(
+    'EOO: ' + data.eoo.toFixed(3) + ' ' + data.units +
+    ' (-' + data.eoo_error.toFixed(3) + ')'
+  )
+  $('#assessment-aoo').text(
+    'AOO: '+ data.aoo + ' Grids'
+  )
+  $('#assessment-aoo-1pc').text(
+    'AOO 1%: ' + data.aoo_1pc + ' Grids'
+  )
+  $('#assessment-loading').addClass('hidden')
+  $('#assessment-results-row').removeClass('hidden')
+}
+
 /** constructs the data packet that we send to our server to get the
  - classified map
  - composition histogram
@@ -147,6 +194,7 @@ function buildPostData () {
     // get the region that the user has selected
   training.region = regionPath()
   training.selected = $('#assessment_select').val()
+  training.assessment = 'all'
   training.predictors = $('#predictors').val()
   training.classList = classList.map(function (myClass, index) {
     var outClass = {}
@@ -159,6 +207,13 @@ function buildPostData () {
   return JSON.stringify(training).replace(/\\r/g, '')
 }
 
+// the training data without the selected class, which doesn't change the assessment of all the classes
+function assessmentKey () {
+  var training = JSON.parse(buildPostData())
+  delete training.selected
+  return JSON.stringify(training)
+}
+
 function validateLatLngPair(pair) {
   // parseFloat isn't used because it will cast '12.3s45' into 12.3
   // +(string) converts the whole string to a float or NaN
@@ -283,44 +338,44 @@ function buildTrainingJSON () {
   
 }
 
-function getPerformance (postData) {
-  $.post('/getperformance',
-    postData,
-    function (data) {
-      $('#results').empty()
-      $('#resultsTable').empty()
-      $('#resultsList').empty()
-      $('#resultsList').append(
-        $('<a class="btn" onClick="moreResults()">More</a>'))
-
-      var toPercent = function(x) { return String(x * 100).substr(0, 6) + '%'; }
-      var dataTooltip = {
-        tooltip: 'Resubstitution Accuracy is a measure of how well the model performs when built on all of the training set.',
-        position: 'right'
+// fills in the accuracy table
+function showPerformance (data) {
+  $('#results').empty()
+  $('#resultsTable').empty()
+  $('#resultsList').empty()
+  $('#resultsList').append(
+    $('<a class="btn" onClick="moreResults()">More</a>'))
+
+  var toPercent = function(x) { return String(x * 100).substr(0, 6) + '%'; }
+  var dataTooltip = {
+    tooltip: 'Resubstitution Accuracy is a measure of how well the model performs when built on all of the training set.',
+    position: 'right'
+  }
+  $('#results')
+  .append($('<a>').text('Resubstitution Accuracy: ' + toPercent(data.accuracy)).tooltip(dataTooltip))
+  
+  $('#resultsTable')
+    .append($('<thead>').append($('<tr>').append([
+      $('<th>').text('Class'),
+      $('<th>').text('Consumers Accuracy'),
+      $('<th>').text('Producers Accuracy')
+    ])))
+    .append($('<tbody>').append(classList.map(
+      function(x, i) {
+        return $('<tr>').append([
+          $('<td>').text(x.name),
+          $('<td>').text(toPercent(data.consumers_accuracy[0][i + 1])),
+          $('<td>').text(toPercent(data.producers_accuracy[i + 1][0]))
+        ])
       }
-      $('#results')
-      .append($('<a>').text('Resubstitution Accuracy: ' + toPercent(data.accuracy)).tooltip(dataTooltip))
-      
-      $('#resultsTable')
-        .append($('<thead>').append($('<tr>').append([
-          $('<th>').text('Class'),
-          $('<th>').text('Consumers Accuracy'),
-          $('<th>').text('Producers Accuracy')
-        ])))
-        .append($('<tbody>').append(classList.map(
-          function(x, i) {
-            return $('<tr>').append([
-              $('<td>').text(x.name),
-              $('<td>').text(toPercent(data.consumers_accuracy[0][i + 1])),
-              $('<td>').text(toPercent(data.producers_accuracy[i + 1][0]))
-            ])
-          }
-        )).append($('<tr>').append([
-          $('<td>').append($('<b>').text('Resubstitution Accuracy')),
-          $('<td>').append($('<b>').text(toPercent(data.accuracy)))
-        ]))
-      )
-    }, 'json')
+    )).append($('<tr>').append([
+      $('<td>').append($('<b>').text('Resubstitution Accuracy')),
+      $('<td>').append($('<b>').text(toPercent(data.accuracy)))
+    ])).append($('<tr>').append([
+      $('<td>').append($('<b>').text('Kappa')),
+      $('<td>').append($('<b>').text(String(data.kappa).substr(0, 6)))
+    ]))
+  )
 }
 
 function doDownload(fileName, blob) {
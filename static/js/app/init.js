@@ -13,6 +13,8 @@ var listenerHandle = false
 var classified = false
 var region = false
 var refreshChart = true
+var histData = null // area histogram from the last classification
+var assessmentData = null // assessment of every class from the last /getassessment run, by assessmentKey()
 var mapBuffer = 0.01 // lat long used when we surround the csv loaded points
 var past = false;
 // colours from  https://personal.sron.nl/~pault/